@@ -0,0 +1,85 @@
+import numpy as np
+from imblearn.over_sampling import SMOTE
+from imblearn.pipeline import Pipeline
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.compose import make_column_transformer
+from sklearn.impute import KNNImputer
+from sklearn.preprocessing import OneHotEncoder, OrdinalEncoder, MinMaxScaler, KBinsDiscretizer
+
+# Classifiers that get one hot encoded features, the others get ordinal and discretized features
+TREE_BASED_CLASSIFIERS = ['DecisionTreeClassifier', 'BaggingClassifier', 'AdaBoostClassifier', 'RandomForestClassifier']
+
+
+def make_encoder(categorical_columns, categories, one_hot=True):
+    """
+    Encodes the categorical columns, the other columns are passed through
+    :param categorical_columns: Names of the categorical columns
+    :param categories: List with the categories of every categorical column, of the labeled and unlabeled data
+    :param one_hot: If True, the columns are one hot encoded. If False, they are ordinal encoded.
+    :return: Column transformer
+    """
+    if one_hot:
+        encoder = OneHotEncoder(sparse_output=False, handle_unknown='ignore', categories=categories)
+    else:
+        encoder = OrdinalEncoder(categories=categories)
+    return make_column_transformer((encoder, categorical_columns), remainder='passthrough')
+
+
+def make_pipeline(classifier, categorical_columns, categories, memory=None, random_state=None):
+    """
+    Build the encoder -> MinMaxScaler -> KNNImputer -> (KBinsDiscretizer) -> SMOTE -> classifier pipeline
+    With a memory, the fitted preprocessing steps are cached on disk, keyed by their parameters and the data they are
+    fitted on. Every fold of a cross validation then only pays for the preprocessing once, the candidates of a grid
+    search over the parameters of the model and the pipelines that share their preprocessing reuse it.
+    :param classifier: The model, the last step of the pipeline
+    :param categorical_columns: Names of the categorical columns
+    :param categories: List with the categories of every categorical column
+    :param memory: joblib Memory or the directory to cache the fitted preprocessing in, None to disable caching
+    :param random_state: Seed of SMOTE, fix it to make the cached samples reproducible
+    :return: Pipeline
+    """
+    tree_based = classifier.__class__.__name__ in TREE_BASED_CLASSIFIERS
+    steps = [('encoder', make_encoder(categorical_columns, categories, one_hot=tree_based)),
+             ('scaler', MinMaxScaler()),
+             ('imputer', KNNImputer()),
+             ('sample', SMOTE(random_state=random_state)),
+             ('model', classifier)]
+    if not tree_based:
+        steps.insert(3, ('discretizer', KBinsDiscretizer(n_bins=5, encode='ordinal', strategy='uniform')))
+    return Pipeline(steps=steps, memory=memory)
+
+
+def take_rows(data, rows):
+    """
+    Select rows of a DataFrame, Series or array by their positions
+    """
+    if hasattr(data, 'iloc'):
+        return data.iloc[rows]
+    return np.take(data, rows, axis=0)
+
+
+def fit_preprocessing(pipeline, X, y):
+    """
+    Fit the preprocessing steps of a pipeline into its memory, without fitting the model
+    Nothing is returned, so a parallel job doesn't send the fitted steps back.
+    """
+    steps = [(name, clone(step)) for name, step in pipeline.steps[:-1]] + [(pipeline.steps[-1][0], 'passthrough')]
+    Pipeline(steps=steps, memory=pipeline.memory).fit(X, y)
+
+
+def warm_cache(pipeline, X, y, cv, n_jobs=-1):
+    """
+    Fit the preprocessing of every fold once and in parallel, before a grid search or cross validation uses the cache
+    Without this, the parallel candidates of the first folds all miss the cache and fit the same preprocessing.
+    The cv must have a fixed random_state, so it gives the same folds to the grid search.
+    :param pipeline: Pipeline with a memory, see make_pipeline
+    :param X: Training data
+    :param y: Training labels
+    :param cv: Cross validation splitter
+    :param n_jobs: Number of parallel jobs, -1 to use all cores
+    """
+    if pipeline.memory is None:
+        raise ValueError("The pipeline has no memory to cache the preprocessing in")
+    Parallel(n_jobs=n_jobs)(delayed(fit_preprocessing)(pipeline, take_rows(X, train), take_rows(y, train))
+                            for train, _ in cv.split(X, y))
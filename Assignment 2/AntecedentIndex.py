@@ -0,0 +1,81 @@
+from bisect import bisect_left
+
+
+class AntecedentIndex:
+    """
+    Prefix tree over the sorted antecedents of the rules, replaces rules_cache for finding the fired rules.
+    Every node is a [children, rules] pair: children maps the next item of an antecedent to its node, rules are the
+    indices of the rules of which the antecedent ends in the node.
+    A lookup only walks the paths of which every item is in the basket, so it only visits prefixes of fired rules
+    instead of every rule that shares an item with the basket.
+    """
+
+    def __init__(self, rules=()):
+        """
+        :param rules: list of (antecedent, consequent, support, confidence) rules, None for a removed rule
+        """
+        self.root = [dict(), []]
+        self.size = 0
+        for index, rule in enumerate(rules):
+            if rule is not None:
+                self.add(rule[0], index)
+
+    def add(self, antecedent, index):
+        node = self.root
+        for item in sorted(antecedent):
+            children = node[0]
+            if item not in children:
+                children[item] = [dict(), []]
+            node = children[item]
+        node[1].append(index)
+        self.size += 1
+
+    def discard(self, antecedent, index):
+        items = sorted(antecedent)
+        path = [self.root]
+        for item in items:
+            node = path[-1][0].get(item)
+            if node is None:
+                return
+            path.append(node)
+        if index not in path[-1][1]:
+            return
+        path[-1][1].remove(index)
+        self.size -= 1
+        # Remove the nodes that no longer lead to a rule, from the end of the path
+        for depth in range(len(items), 0, -1):
+            children, rules = path[depth]
+            if children or rules:
+                break
+            del path[depth - 1][0][items[depth - 1]]
+
+    def fired(self, basket):
+        """
+        Finds the rules of which the whole antecedent is in the basket.
+        :param basket: set of items
+        :return: list with the indices of the fired rules
+        """
+        items = sorted(basket)
+        result = []
+        # Nodes to visit, with the position in items from which their children can be found
+        stack = [(self.root, 0)]
+        while stack:
+            (children, rules), start = stack.pop()
+            result.extend(rules)
+            if not children:
+                continue
+            if len(children) < len(items) - start:
+                # Fewer children than remaining items, look the children up in the basket
+                for item, child in children.items():
+                    if item in basket:
+                        stack.append((child, bisect_left(items, item, start) + 1))
+            else:
+                for position in range(start, len(items)):
+                    child = children.get(items[position])
+                    if child is not None:
+                        stack.append((child, position + 1))
+        return result
+
+    def __len__(self):
+        return self.size
+
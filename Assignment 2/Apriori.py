@@ -1,11 +1,19 @@
-import cProfile
 import pathlib
-import time
 import subprocess
-from itertools import chain, combinations, filterfalse
-from pstats import SortKey
+import sys
+from itertools import chain, combinations, groupby
+
+import numpy as np
+
+from FPGrowth import fp_growth
+from Instrumentation import instrumentation
+from TransactionDatabase import TransactionDatabase, count_items
+from TransactionStream import TransactionStream
 from utils import read_transactions, read_frequent_itemsets
 
+# Number of set bits for every possible byte, used when numpy has no bitwise_count
+POPCOUNT_TABLE = np.array([bin(byte).count("1") for byte in range(256)], dtype=np.uint8)
+
 
 def powerset(iterable):
     """
@@ -17,99 +25,255 @@ def powerset(iterable):
 
 def join_set(itemsets, k):
     """
-    Joins the itemsets of size k-1 to itemsets of size k.
-    :param itemsets: input itemsets
+    Joins the itemsets of size k-1 to candidate itemsets of size k (slide 25).
+    Only itemsets that share their first k-2 items are joined, and candidates that have a subset of size k-1
+    that is not in itemsets are pruned before their support is counted.
+    :param itemsets: frequent itemsets of size k-1
     :param k: size of candidate itemsets
-    :return: candidate itemsets of size k
+    :return: candidate itemsets of size k as sorted tuples
+    """
+    itemsets = sorted(tuple(sorted(itemset)) for itemset in itemsets)
+    frequent = set(itemsets)
+    candidates = []
+    # Itemsets with the same prefix are next to each other after sorting
+    for prefix, group in groupby(itemsets, key=lambda itemset: itemset[:-1]):
+        last_items = [itemset[-1] for itemset in group]
+        for i, item1 in enumerate(last_items):
+            for item2 in last_items[i + 1:]:
+                candidate = prefix + (item1, item2)
+                # The subsets without one of the last two items are the joined itemsets, so they are frequent
+                if all(candidate[:j] + candidate[j + 1:] in frequent for j in range(k - 2)):
+                    candidates.append(candidate)
+    return candidates
+
+
+def popcount(words):
+    """
+    Counts the set bits in the last axis of an uint64 array.
+    :param words: packed bitsets
+    :return: number of set bits per bitset
+    """
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(words).sum(axis=-1, dtype=np.int64)
+    words = np.ascontiguousarray(words)
+    return POPCOUNT_TABLE[words.view(np.uint8)].sum(axis=-1, dtype=np.int64)
+
+
+def transaction_bitmaps(transactions, items=None):
     """
-    # Doesn't uses better candidate item generation from slide 25
-    return set(
-        [itemset1.union(itemset2) for itemset1 in itemsets for itemset2 in itemsets if
-         len(itemset1.union(itemset2)) == k]
-    )
+    Builds the vertical representation of the transactions.
+    Every item gets a bitset packed in uint64 words over the transaction ids,
+    bit t of the bitset of an item is set if the item occurs in transaction t.
+    :param transactions: list of transactions or a TransactionDatabase
+    :param items: items to build a bitset for, all items in the transactions if None
+    :return: dict mapping each item to its row in the bitmaps and the bitmaps themselves
+    """
+    if items is None:
+        items = count_items(transactions)
+    index = {item: row for row, item in enumerate(items)}
+    n_words = (len(transactions) + 63) // 64
+    # The last row stays empty, it is used for items that don't occur in any transaction
+    bitmaps = np.zeros((len(index) + 1, n_words), dtype=np.uint64)
+
+    if isinstance(transactions, TransactionDatabase):
+        # The (item, transaction) pairs come straight from the arrays of the database
+        lookup = np.full(max(max(index, default=0), int(transactions.indices.max(initial=0))) + 1, -1,
+                         dtype=np.int64)
+        lookup[list(index)] = list(index.values())
+        rows = lookup[transactions.indices]
+        known = rows >= 0
+        rows = rows[known]
+        tids = transactions.transaction_ids()[known]
+    else:
+        rows = []
+        tids = []
+        for tid, transaction in enumerate(transactions):
+            for item in transaction:
+                if item in index:
+                    rows.append(index[item])
+                    tids.append(tid)
+        rows = np.array(rows, dtype=np.int64)
+        tids = np.array(tids, dtype=np.int64)
+    if len(rows):
+        # Every (item, transaction) pair sets a different bit, so or-ing the bits of a word is the same as summing them
+        keys = rows * n_words + (tids >> 6)
+        bits = np.left_shift(np.uint64(1), (tids & 63).astype(np.uint64))
+        order = np.argsort(keys, kind="stable")
+        keys, starts = np.unique(keys[order], return_index=True)
+        bitmaps.reshape(-1)[keys] = np.bitwise_or.reduceat(bits[order], starts)
+    return index, bitmaps
 
 
-def itemsets_support(transactions, itemsets, min_support):
+def bitmaps_support(vertical, itemsets, batch_size=1024):
+    """
+    Counts the support of the itemsets using the vertical representation of the transactions.
+    The support of an itemset is the number of set bits in the AND of the bitsets of its items.
+    :param vertical: item index and bitmaps as returned by transaction_bitmaps
+    :param itemsets: list of non-empty itemsets to count
+    :param batch_size: number of itemsets of which the bitsets are combined at once
+    :return: absolute support of every itemset, in the same order as the itemsets
+    """
+    index, bitmaps = vertical
+    missing = len(bitmaps) - 1
+    counts = np.zeros(len(itemsets), dtype=np.int64)
+
+    # Group the itemsets by length so the rows of each group can be gathered as one 2D index array
+    by_length = {}
+    for position, itemset in enumerate(itemsets):
+        by_length.setdefault(len(itemset), []).append(position)
+    for length, positions in by_length.items():
+        positions = np.array(positions, dtype=np.int64)
+        rows = np.array([[index.get(item, missing) for item in itemsets[position]] for position in positions],
+                        dtype=np.int64)
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            words = bitmaps[batch[:, 0]]
+            for column in range(1, length):
+                np.bitwise_and(words, bitmaps[batch[:, column]], out=words)
+            counts[positions[start:start + batch_size]] = popcount(words)
+    return counts
+
+
+def count_support(transactions, itemsets, vertical=None):
+    """
+    Counts the absolute support of the itemsets in the transactions.
+    The transactions of a TransactionStream are counted a chunk at a time, in one pass over the file.
+    :param transactions: list of transactions, a TransactionDatabase or a TransactionStream
+    :param itemsets: list of non-empty itemsets to count
+    :param vertical: item index and bitmaps as returned by transaction_bitmaps, built from the transactions if None
+    :return: absolute support of every itemset, in the same order as the itemsets
+    """
+    if isinstance(transactions, TransactionStream):
+        items = set(chain(*itemsets))
+        counts = np.zeros(len(itemsets), dtype=np.int64)
+        # Without itemsets there is no need to read the file
+        for chunk in transactions.chunks() if itemsets else []:
+            counts += bitmaps_support(transaction_bitmaps(chunk, items), itemsets)
+        return counts
+    if vertical is None:
+        vertical = transaction_bitmaps(transactions, set(chain(*itemsets)))
+    return bitmaps_support(vertical, itemsets)
+
+
+def itemsets_support(transactions, itemsets, min_support, vertical=None):
     """
     Returns the relative support of the itemsets in the transactions.
+    :param vertical: item index and bitmaps as returned by transaction_bitmaps, built from the transactions if None
+                     (not used for a TransactionStream)
     :return: itemsets with relative support >= min_support
     """
-    support_count = {itemset: 0 for itemset in itemsets}
-    for transaction in transactions:
-        for itemset in itemsets:
-            if itemset.issubset(transaction):
-                support_count[itemset] += 1
+    itemsets = list(itemsets)
+    support_count = count_support(transactions, itemsets, vertical)
     n_transactions = len(transactions)
-    return {itemset: support / n_transactions for itemset, support in support_count.items() if
+    return {itemset: support / n_transactions for itemset, support in zip(itemsets, support_count.tolist()) if
             support / n_transactions >= min_support}
 
 
-def apriori(transactions, min_support):
+def apriori(transactions, min_support, backend="apriori"):
     """
     Runs the apriori algorithm
+    :param transactions: list of transactions, a TransactionDatabase, a TransactionStream or the filename of a
+                         transaction file
+    :param min_support: minimum relative support of a frequent itemset
+    :param backend: "apriori" for level-wise mining or "fpgrowth" for mining with an FP-tree
+    :return: frequent itemsets and frequent itemsets by length, both as dicts mapping itemsets to their relative support
     """
-    items = set(chain(*transactions))
-    itemsets = [frozenset([item]) for item in items]
-    itemsets_by_length = [set()]
-    k = 1
-    while itemsets:
-        support_count = itemsets_support(transactions, itemsets, min_support)
-        itemsets_by_length.append(set(support_count.keys()))
-
-        k += 1
-        # Changed this line to enforce use of monotonicity
-        itemsets = join_set(set(support_count.keys()), k)
-    frequent_itemsets = set(chain(*itemsets_by_length))
+    if backend == "fpgrowth":
+        return fp_growth(transactions, min_support)
+    if backend != "apriori":
+        raise ValueError(f"Unknown backend {backend}")
+    if isinstance(transactions, (str, pathlib.Path)):
+        transactions = read_transactions(transactions)
+
+    with instrumentation.stage("apriori", min_support=min_support):
+        # Count the items in a single scan, only the frequent items need a bitset
+        n_transactions = len(transactions)
+        item_counts = count_items(transactions)
+        items = [item for item, count in item_counts.items() if count / n_transactions >= min_support]
+        # The bitmaps of a stream don't fit in memory, every level is counted in a pass over the stream instead
+        vertical = None if isinstance(transactions, TransactionStream) else transaction_bitmaps(transactions, items)
+
+        # Candidates are kept as sorted tuples, only the frequent itemsets are converted to frozensets
+        itemsets = [(item,) for item in items]
+        itemsets_by_length = [dict()]
+        k = 1
+        while itemsets:
+            instrumentation.count(f"candidates_level_{k}", len(itemsets))
+            support_count = itemsets_support(transactions, itemsets, min_support, vertical)
+            itemsets_by_length.append({frozenset(itemset): support for itemset, support in support_count.items()})
+            instrumentation.count(f"itemsets_level_{k}", len(support_count))
+
+            k += 1
+            itemsets = join_set(support_count.keys(), k)
+    frequent_itemsets = dict()
+    for itemsets in itemsets_by_length:
+        frequent_itemsets.update(itemsets)
     return frequent_itemsets, itemsets_by_length
 
 
+def generate_rules(frequent_itemsets, support_dict, min_confidence=0.05):
+    """
+    Generates the association rules from the frequent itemsets lazily.
+    The consequents of the rules of an itemset are grown level-wise. Moving an item from the antecedent to the
+    consequent can't increase the confidence, so a consequent is only extended if its rule reaches min_confidence.
+    :param frequent_itemsets: frequent itemsets, as frozensets or sorted tuples
+    :param support_dict: support of every frequent itemset
+    :param min_confidence: minimum confidence of a rule
+    :return: generator of (antecedent, consequent, support, confidence) tuples, of the same type as the itemsets
+    """
+    for itemset in frequent_itemsets:
+        support_itemset = support_dict[itemset]
+        container = type(itemset)
+        items = tuple(sorted(itemset))
+        consequents = [(item,) for item in items]
+        m = 1
+        # The antecedent can't be empty
+        while consequents and m < len(items):
+            confident = []
+            for consequent in consequents:
+                antecedent = container(item for item in items if item not in consequent)
+                confidence = support_itemset / support_dict[antecedent]
+                if confidence >= min_confidence:
+                    confident.append(consequent)
+                    yield antecedent, container(consequent), support_itemset, confidence
+            m += 1
+            if m == 2:
+                # Every pair of single items is a candidate, there are no smaller subsets to check
+                consequents = list(combinations(chain(*confident), 2))
+            elif len(confident) > 1:
+                consequents = join_set(confident, m)
+            else:
+                break
+
+
 def association_rules(frequent_itemsets, support_itemsets, min_confidence=0.05):
     """
     Returns the association rules from the frequent itemsets.
     """
-    support_dict = {itemset: support for itemset, support in zip(frequent_itemsets, support_itemsets)}
-
-    rules = []
-    for itemset, support_itemset in zip(frequent_itemsets, support_itemsets):
-        for subset in filterfalse(lambda x: not x, powerset(itemset)):
-            antecedent = frozenset(subset)
-            consequent = itemset - antecedent
-            confidence = support_itemset / support_dict[antecedent]
-            if confidence >= min_confidence:
-                rules.append((antecedent, consequent, support_itemset, confidence))
+    with instrumentation.stage("association_rules", min_confidence=min_confidence):
+        support_dict = {itemset: support for itemset, support in zip(frequent_itemsets, support_itemsets)}
+        rules = list(generate_rules(frequent_itemsets, support_dict, min_confidence))
+    instrumentation.count("rules", len(rules))
     return rules, support_dict
 
 
 if __name__ == "__main__":
-    # Example usage
-    # transactions = [
-    #     {"A", "B", "C"},
-    #     {"A", "B"},
-    #     {"A", "C"},
-    #     {"A"},
-    #     {"B", "C"},
-    #     {"B"},
-    #     {"C"},
-    # ]
-    start_time = time.time()
-    transactions = read_transactions("data/retail.dat")
-    min_support = 0.2
-    min_confidence = 0.5
-    # rules = association_rules(transactions, min_support, min_confidence, cpp=True)
-    # for antecedent, consequent, support, confidence in rules:
-    #     print(f"{antecedent} => {consequent} (support={support:.2f}, confidence={confidence:.2f})")
-
-    print("--- %s seconds ---" % (time.time() - start_time))
-
-    # Example usage with profiling
-    # with cProfile.Profile() as pr:
-    #     # ... do something ...
-    #     transactions = read_transactions("data/retail.dat")
-    #     min_support = 0.2
-    #     min_confidence = 0.5
-    #     rules = association_rules(transactions, min_support, min_confidence)
-    #     for antecedent, consequent, support, confidence in rules:
-    #         print(f"{antecedent} => {consequent} (support={support:.2f}, confidence={confidence:.2f})")
-    #
-    #     pr.print_stats(sort=SortKey.CUMULATIVE)
-    #     pr.print_stats(sort=SortKey.TIME)
+    # Usage: python Apriori.py [transaction file] [min_support] [min_confidence] [timer|cprofile|sampling]
+    # The stages are measured in the given mode, the trace and the profiles are written to results/profiling
+    filename = sys.argv[1] if len(sys.argv) > 1 else "data/retail.dat"
+    min_support = float(sys.argv[2]) if len(sys.argv) > 2 else 0.2
+    min_confidence = float(sys.argv[3]) if len(sys.argv) > 3 else 0.5
+    instrumentation.configure(mode=sys.argv[4] if len(sys.argv) > 4 else "cprofile", memory=True)
+
+    with instrumentation.stage("read_transactions"):
+        transactions = read_transactions(filename)
+    instrumentation.snapshot("read_transactions")
+    frequent_itemsets, _ = apriori(transactions, min_support)
+    instrumentation.snapshot("apriori")
+    rules, _ = association_rules(list(frequent_itemsets.keys()), list(frequent_itemsets.values()), min_confidence)
+    instrumentation.snapshot("association_rules")
+    for antecedent, consequent, support, confidence in rules[:10]:
+        print(f"{set(antecedent)} => {set(consequent)} (support={support:.2f}, confidence={confidence:.2f})")
+
+    print(instrumentation.report())
+    instrumentation.export("results/profiling/apriori.json")
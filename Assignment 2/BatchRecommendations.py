@@ -0,0 +1,217 @@
+import numpy as np
+from scipy.sparse import csr_matrix, diags
+
+from Instrumentation import instrumentation
+from Recommendations import STRATEGIES
+
+# Entries of the (baskets x items) score matrices and the (baskets x rules) matrix of the fired rules of a chunk,
+# the default chunk size keeps both below this number
+CHUNK_ENTRIES = 1 << 22
+
+
+def itemset_matrix(itemsets, n_columns):
+    """
+    Builds a sparse 0/1 matrix with a row per itemset and a column per item code.
+    :param itemsets: list of itemsets of item codes
+    :param n_columns: number of columns, codes of n_columns or more are left out
+    :return: CSR matrix
+    """
+    itemsets = [[item for item in itemset if item < n_columns] for itemset in itemsets]
+    lengths = np.fromiter(map(len, itemsets), dtype=np.int64, count=len(itemsets))
+    indptr = np.zeros(len(itemsets) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=indptr[1:])
+    indices = np.fromiter((item for itemset in itemsets for item in itemset), dtype=np.int64, count=indptr[-1])
+    return csr_matrix((np.ones(len(indices)), indices, indptr), shape=(len(itemsets), n_columns))
+
+
+def table_matrix(table, ids, n_columns):
+    """
+    Builds a sparse 0/1 matrix with a row per id in an ItemsetTable, straight from the CSR arrays of the table.
+    :param table: ItemsetTable
+    :param ids: ids of the itemsets, one row per id
+    :param n_columns: number of columns, at least the largest code + 1
+    :return: CSR matrix
+    """
+    lengths = np.diff(table.indptr)[ids]
+    indptr = np.zeros(len(ids) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=indptr[1:])
+    starts = np.repeat(table.indptr[ids] - indptr[:-1], lengths)
+    indices = table.indices[starts + np.arange(indptr[-1])]
+    return csr_matrix((np.ones(len(indices)), indices, indptr), shape=(len(ids), n_columns))
+
+
+def top_items(primary, secondary, top_n):
+    """
+    Selects the top n items of every row, ranked on the primary scores with ties broken by the secondary scores.
+    Items that aren't candidates must have a primary score of -inf.
+    :param primary: dense (baskets x items) primary scores
+    :param secondary: dense (baskets x items) secondary scores or None
+    :param top_n: number of items to recommend
+    :return: list with the recommended items of every row
+    """
+    n_rows, n_items = primary.shape
+    k = min(top_n, n_items)
+    if k == 0:
+        return [[] for _ in range(n_rows)]
+    rows = np.arange(n_rows)
+    # The k-th largest score of every row, every item with at least that score could be in the top n
+    kth = primary[rows, np.argpartition(-primary, k - 1, axis=1)[:, k - 1]]
+    rows, items = np.nonzero((primary >= kth[:, None]) & (primary > -np.inf))
+    keys = (-primary[rows, items],) if secondary is None else (-secondary[rows, items], -primary[rows, items])
+    order = np.lexsort(keys + (rows,))
+    rows = rows[order]
+    items = items[order]
+    # Rank of every item within its row, the ties beyond the k-th place are dropped
+    starts = np.searchsorted(rows, rows)
+    keep = np.arange(len(rows)) - starts < k
+    rows = rows[keep]
+    items = items[keep]
+    ends = np.searchsorted(rows, np.arange(n_rows), side="right")
+    return [chunk.tolist() for chunk in np.split(items, ends[:-1])]
+
+
+class BatchRecommender:
+    """
+    Recommends items for many baskets at once with sparse matrix products instead of a loop over the rules.
+    A rule fires for a basket if the number of its antecedent items in the basket equals the antecedent length,
+    the scores of the consequent items are then aggregated by multiplying the fired rules with the consequents.
+    """
+
+    def __init__(self, rules, popular_items=None, chunk_size=None):
+        """
+        :param rules: RuleStore (or a view on one) of which the itemsets are encoded as item codes
+        :param popular_items: items ranked on popularity, for recommend_popularity
+        :param chunk_size: number of baskets that are scored at once, by default as many as keep the matrices of a
+                           chunk below CHUNK_ENTRIES entries
+        """
+        self.rules = rules
+        self.popular_items = popular_items if popular_items is not None else []
+
+        table = rules.itemsets
+        self.n_items = int(table.indices.max()) + 1 if len(table.indices) else 0
+        self.antecedents = table_matrix(table, rules.antecedents, self.n_items)
+        self.consequents = table_matrix(table, rules.consequents, self.n_items)
+        self.antecedent_lengths = np.diff(self.antecedents.indptr)
+        self.confidences = np.asarray(rules.confidences, dtype=np.float64)
+        self.supports = np.asarray(rules.supports, dtype=np.float64)
+        self.lifts = self.confidences / np.asarray(table.supports, dtype=np.float64)[rules.antecedents]
+        # The dense scores have a column per item, the fired rules at most a column per rule
+        self.chunk_size = chunk_size or max(CHUNK_ENTRIES // max(self.n_items, len(self.confidences), 1), 1)
+
+    def fired_rules(self, baskets):
+        """
+        Finds the rules of which the whole antecedent is in the basket.
+        :param baskets: CSR matrix of baskets
+        :return: CSR (baskets x rules) matrix with a 1 for every fired rule
+        """
+        hits = (baskets @ self.antecedents.T).tocsr()
+        hits.data = (hits.data == self.antecedent_lengths[hits.indices]).astype(np.float64)
+        hits.eliminate_zeros()
+        return hits
+
+    def consequent_overlap(self, fired, baskets):
+        """
+        Counts the consequent items of every fired rule that are in its basket.
+        Only the fired (basket, rule) pairs are looked at, instead of the overlap of every basket with every rule.
+        :param fired: CSR (baskets x rules) matrix of the fired rules, see fired_rules
+        :param baskets: CSR matrix of baskets
+        :return: array with the count of every stored entry of fired
+        """
+        rows = np.repeat(np.arange(fired.shape[0]), np.diff(fired.indptr))
+        lengths = np.diff(self.consequents.indptr)[fired.indices]
+        offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        # Entry of fired and consequent item of every (fired rule, consequent item) pair
+        entries = np.repeat(np.arange(len(lengths)), lengths)
+        starts = np.repeat(self.consequents.indptr[fired.indices] - offsets[:-1], lengths)
+        items = self.consequents.indices[starts + np.arange(offsets[-1])]
+
+        # A (basket, item) pair as a single number, to look the pairs up in the items of the baskets
+        basket_keys = np.repeat(np.arange(baskets.shape[0]), np.diff(baskets.indptr)) * self.n_items + baskets.indices
+        in_basket = np.isin(rows[entries] * self.n_items + items, basket_keys)
+        return np.bincount(entries, weights=in_basket, minlength=len(lengths))
+
+    def item_statistics(self, baskets, statistics):
+        """
+        Computes the requested statistics of the consequent items of the fired rules.
+        :param baskets: CSR matrix of baskets
+        :param statistics: names of the statistics, see Recommendations.STRATEGIES
+        :return: dict mapping every statistic to a dense (baskets x items) array, items without rules are -inf
+        """
+        fired = self.fired_rules(baskets)
+        if instrumentation.enabled:
+            instrumentation.count("fired_rules", np.diff(fired.indptr))
+        number_rules = (fired @ self.consequents).toarray()
+        # Items of the basket itself are never recommended
+        candidates = (number_rules > 0) & (baskets.toarray() == 0)
+
+        # The averages share their totals, every product is only computed once
+        totals = dict()
+        weighted = None
+        result = dict()
+        for statistic in statistics:
+            total = statistic.replace("average_", "total_")
+            if total not in totals:
+                if total == "number_rules":
+                    values = number_rules
+                elif total == "total_confidence":
+                    values = (fired @ diags(self.confidences) @ self.consequents).toarray()
+                elif total == "total_support":
+                    values = (fired @ diags(self.supports) @ self.consequents).toarray()
+                elif total == "lift":
+                    values = (fired @ diags(self.lifts) @ self.consequents).toarray()
+                elif total in ("weighted_confidence", "weighted_support"):
+                    if weighted is None:
+                        # The weight of a fired rule is 1 + the number of its consequent items in the basket
+                        weighted = fired.copy()
+                        weighted.data = 1 + self.consequent_overlap(fired, baskets)
+                    column = self.confidences if total == "weighted_confidence" else self.supports
+                    values = (weighted @ diags(column) @ self.consequents).toarray()
+                else:
+                    raise ValueError(f"Unknown statistic {statistic}")
+                totals[total] = values
+            values = totals[total]
+            if statistic.startswith("average_"):
+                values = np.divide(values, number_rules, out=np.zeros_like(values), where=number_rules > 0)
+            result[statistic] = np.where(candidates, values, -np.inf)
+        return result
+
+    def recommend(self, baskets, strategy, top_n=5):
+        """
+        Recommends items for all baskets with one of the strategies of Recommendations.py.
+        :param baskets: list of baskets (sets of item codes)
+        :param strategy: name of the recommend_* function to reproduce
+        :param top_n: number of items to recommend per basket
+        :return: list with the recommended items of every basket
+        """
+        return self.recommend_all(baskets, [strategy], [top_n])[strategy, top_n]
+
+    def recommend_all(self, baskets, strategies, top_ns):
+        """
+        Recommends items for all baskets with several strategies and cutoffs.
+        The fired rules and the statistics they share are computed once per chunk of baskets for all strategies.
+        :param baskets: list of baskets (sets of item codes)
+        :param strategies: names of the recommend_* functions to reproduce
+        :param top_ns: numbers of items to recommend per basket
+        :return: dict mapping every (strategy, top_n) pair to the list with the recommended items of every basket
+        """
+        recommendations = {(strategy, top_n): [] for strategy in strategies for top_n in top_ns}
+        rule_strategies = [strategy for strategy in strategies if strategy != "recommend_popularity"]
+        statistics = list(dict.fromkeys(name for strategy in rule_strategies for name in STRATEGIES[strategy]
+                                        if name is not None))
+        for start in range(0, len(baskets), self.chunk_size):
+            # Items that no rule knows can't fire a rule, they are left out of the matrix
+            with instrumentation.stage("recommend", baskets=min(self.chunk_size, len(baskets) - start)):
+                chunk = itemset_matrix(baskets[start:start + self.chunk_size], self.n_items)
+                scores = self.item_statistics(chunk, statistics) if statistics else dict()
+                for strategy in rule_strategies:
+                    primary, secondary = STRATEGIES[strategy]
+                    for top_n in top_ns:
+                        recommendations[strategy, top_n].extend(
+                            top_items(scores[primary], scores.get(secondary), top_n))
+
+        if "recommend_popularity" in strategies:
+            for top_n in top_ns:
+                recommendations["recommend_popularity", top_n] = [
+                    [item for item in self.popular_items if item not in basket][:top_n] for basket in baskets]
+        return recommendations
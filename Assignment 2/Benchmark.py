@@ -0,0 +1,260 @@
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+import Recommendations
+from Apriori import apriori, association_rules
+from Instrumentation import instrumentation
+from ParameterGrid import ParameterGrid
+from Recommendations import recommend_average_confidence, recommend_average_support, recommend_total_confidence, \
+    recommend_total_support, recommend_weighted_confidence, recommend_weighted_support, recommend_number_rules, \
+    recommend_popularity, recommend_lift
+from TransactionDatabase import TransactionDatabase
+from utils import split_transactions, rules_cache
+
+RECOMMENDERS = [
+    recommend_average_confidence,
+    recommend_average_support,
+    recommend_total_confidence,
+    recommend_total_support,
+    recommend_weighted_confidence,
+    recommend_weighted_support,
+    recommend_number_rules,
+    recommend_popularity,
+    recommend_lift,
+]
+
+# Grid of the full benchmark, the first key varies fastest
+GRID = {
+    "min_confidence": [0.05, 0.2],
+    "min_support": [0.02, 0.05],
+    "n_transactions": [2000, 5000],
+}
+QUICK_GRID = {
+    "min_confidence": [0.1],
+    "min_support": [0.02],
+    "n_transactions": [1000],
+}
+
+
+def generate_transactions(n_transactions, n_items=1000, avg_length=10, n_patterns=200, avg_pattern_length=4,
+                          skew=0.5, correlation=0.5, corruption=0.5, seed=0):
+    """
+    Generates a synthetic transaction database like the IBM Quest generator.
+    Transactions are filled with potentially frequent patterns, picked on their weight. Every pattern shares a part
+    of its items with the previous pattern, and loses items at random when it is added to a transaction.
+    :param n_transactions: number of transactions
+    :param n_items: number of distinct items
+    :param avg_length: average number of items of a transaction, the density is avg_length / n_items
+    :param n_patterns: number of potentially frequent patterns
+    :param avg_pattern_length: average number of items of a pattern
+    :param skew: exponent of the Zipf distribution of the items in the patterns, 0 for uniform items
+    :param correlation: average fraction of the items of a pattern that are taken from the previous pattern
+    :param corruption: average chance that a pattern loses an item when it is added to a transaction
+    :param seed: seed of the random generator, the same seed gives the same transactions
+    :return: list of transactions as sets of items
+    """
+    rng = np.random.default_rng(seed)
+    item_weights = 1 / np.arange(1, n_items + 1) ** skew
+    item_weights /= item_weights.sum()
+
+    patterns = []
+    for _ in range(n_patterns):
+        length = min(max(rng.poisson(avg_pattern_length), 1), n_items)
+        items = set()
+        if patterns:
+            shared = min(int(round(rng.exponential(correlation) * length)), length, len(patterns[-1]))
+            items.update(rng.choice(patterns[-1], shared, replace=False).tolist())
+        while len(items) < length:
+            items.update(rng.choice(n_items, length - len(items), p=item_weights).tolist())
+        patterns.append(sorted(items))
+    pattern_weights = rng.exponential(1, n_patterns)
+    pattern_weights /= pattern_weights.sum()
+    corruptions = np.clip(rng.normal(corruption, 0.1, n_patterns), 0, 1)
+
+    transactions = []
+    for _ in range(n_transactions):
+        length = max(rng.poisson(avg_length), 1)
+        transaction = set()
+        while len(transaction) < length:
+            index = rng.choice(n_patterns, p=pattern_weights)
+            pattern = list(patterns[index])
+            # Drop items as long as a uniform number is below the corruption level
+            while pattern and rng.random() < corruptions[index]:
+                pattern.pop(rng.integers(len(pattern)))
+            # A pattern that doesn't fit is added anyway half of the time
+            if transaction and len(transaction) + len(pattern) > length and rng.random() < 0.5:
+                break
+            transaction.update(pattern)
+        transactions.append(transaction)
+    return transactions
+
+
+def measure(function, *args, repeat=1, memory=True):
+    """
+    Measures a call of the function.
+    :param repeat: number of timed calls, the fastest one is reported
+    :param memory: if True, the peak memory is measured in one more call with tracemalloc,
+                   so the overhead of tracemalloc doesn't affect the time
+    :return: result of the function and a dict with the wall time in seconds and the peak memory in bytes
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(*args)
+        times.append(time.perf_counter() - start)
+    measurement = {"time": min(times)}
+    if memory:
+        tracemalloc.start()
+        try:
+            function(*args)
+            measurement["peak_memory"] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return result, measurement
+
+
+def candidates_per_level(counters):
+    """
+    Number of candidates apriori counted at every level, read from the candidates_level_<k> counters it reports.
+    Every measured call counts the same candidates, so the largest observation of a level is its count.
+    :param counters: counters of the instrumentation
+    """
+    candidates = []
+    while f"candidates_level_{len(candidates) + 1}" in counters:
+        candidates.append(counters[f"candidates_level_{len(candidates) + 1}"][2])
+    return candidates
+
+
+def benchmark(params, transactions, repeat=1, memory=True, seed=0, test_size=0.15):
+    """
+    Benchmarks mining, rule generation and every recommender for one parameter combination.
+    :param params: dict with min_support and min_confidence
+    :param transactions: TransactionDatabase to benchmark on
+    :return: dict with the measurements of every stage
+    """
+    train, test = transactions.split(test_size=test_size, random_state=seed)
+    # split_transactions samples the ground truth with random
+    random.seed(seed)
+    test = split_transactions(test)
+    Recommendations.popular_items = train.popular_items(50)
+
+    result = dict()
+    # Only apriori is instrumented, the hooks of the recommenders would add to their times
+    instrumentation.configure()
+    try:
+        (frequent_itemsets, itemsets_by_length), result["apriori"] = measure(
+            apriori, train, params["min_support"], repeat=repeat, memory=memory)
+        result["apriori"]["candidates"] = candidates_per_level(instrumentation.counters)
+    finally:
+        instrumentation.configure(enabled=False)
+    result["apriori"]["frequent"] = [len(itemsets) for itemsets in itemsets_by_length[1:]]
+
+    (rules, support_dict), result["association_rules"] = measure(
+        association_rules, list(frequent_itemsets.keys()), list(frequent_itemsets.values()), params["min_confidence"],
+        repeat=repeat, memory=memory)
+    result["association_rules"]["rules"] = len(rules)
+
+    cache, result["rules_cache"] = measure(rules_cache, rules, repeat=repeat, memory=memory)
+
+    for recommender in RECOMMENDERS:
+        def recommend_test():
+            return [recommender(input_items, rules, cache, support_dict) for input_items, _ in test]
+
+        _, result[recommender.__name__] = measure(recommend_test, repeat=repeat, memory=memory)
+        result[recommender.__name__]["baskets"] = len(test)
+    return result
+
+
+def run(grid, repeat=1, memory=True, seed=0, **generator):
+    """
+    Runs the benchmark for every combination of the grid.
+    :param grid: dict with lists of n_transactions, min_support and min_confidence
+    :param generator: arguments of generate_transactions
+    :return: JSON serializable report
+    """
+    grid = ParameterGrid(grid)
+    databases = dict()
+    results = []
+    for params in grid:
+        n_transactions = params["n_transactions"]
+        if n_transactions not in databases:
+            databases[n_transactions] = TransactionDatabase.from_transactions(
+                generate_transactions(n_transactions, seed=seed, **generator))
+        print(grid.describe(grid.index(params)), file=sys.stderr)
+        results.append({"params": params,
+                        "stages": benchmark(params, databases[n_transactions], repeat, memory, seed)})
+    return {
+        "config": {"repeat": repeat, "seed": seed, "generator": generator},
+        "machine": {"python": platform.python_version(), "numpy": np.__version__, "platform": platform.platform()},
+        "results": results,
+    }
+
+
+def compare(report, baseline, tolerance=0.25, min_time=0.01):
+    """
+    Compares a report with a baseline report.
+    Times and peak memory may grow with the tolerance, the candidate, frequent itemset and rule counts are
+    deterministic and have to be equal.
+    :param tolerance: allowed relative increase of a time or peak memory
+    :param min_time: times below this number of seconds are too noisy to compare
+    :return: list of regressions as strings, empty if there are none
+    """
+    baseline_results = {json.dumps(result["params"], sort_keys=True): result["stages"]
+                        for result in baseline["results"]}
+    regressions = []
+    for result in report["results"]:
+        key = json.dumps(result["params"], sort_keys=True)
+        if key not in baseline_results:
+            continue
+        for stage, measurement in result["stages"].items():
+            expected = baseline_results[key].get(stage)
+            if expected is None:
+                continue
+            for name, value in measurement.items():
+                if name not in expected:
+                    continue
+                if name in ("time", "peak_memory"):
+                    if name == "time" and max(value, expected[name]) < min_time:
+                        continue
+                    if value > expected[name] * (1 + tolerance):
+                        regressions.append(f"{key} {stage} {name}: {value:.6g} > {expected[name]:.6g} "
+                                           f"(+{value / expected[name] - 1:.0%})")
+                elif value != expected[name]:
+                    regressions.append(f"{key} {stage} {name}: {value} != {expected[name]}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark mining, rule generation and recommendation")
+    parser.add_argument("--output", type=Path, default=Path("results/benchmark.json"))
+    parser.add_argument("--baseline", type=Path, default=Path("results/benchmark_baseline.json"))
+    parser.add_argument("--update-baseline", action="store_true", help="store the report as the new baseline")
+    parser.add_argument("--quick", action="store_true", help="run a single small combination")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc runs")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--seed", type=int, default=0)
+    arguments = parser.parse_args()
+
+    report = run(QUICK_GRID if arguments.quick else GRID, arguments.repeat, not arguments.no_memory, arguments.seed)
+    arguments.output.parent.mkdir(parents=True, exist_ok=True)
+    arguments.output.write_text(json.dumps(report, indent=2))
+
+    if arguments.update_baseline:
+        arguments.baseline.parent.mkdir(parents=True, exist_ok=True)
+        arguments.baseline.write_text(json.dumps(report, indent=2))
+    elif arguments.baseline.exists():
+        regressions = compare(report, json.loads(arguments.baseline.read_text()), arguments.tolerance)
+        for regression in regressions:
+            print(regression)
+        if regressions:
+            sys.exit(1)
+        print("No regressions")
@@ -0,0 +1,209 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+from ItemDictionary import ItemsetTable
+from RuleStore import ARRAYS, INDEX_ARRAYS
+
+# Entries written with another version are stale, bump it when the layout of an entry changes
+VERSION = 2
+# Names of the arrays of cached itemsets
+ITEMSET_ARRAYS = ("indptr", "indices", "supports")
+
+
+def fingerprint(*sources):
+    """
+    Hashes the contents of the input data of an artifact.
+    :param sources: files (Path), strings, numpy arrays or JSON serializable values
+    :return: hex digest
+    """
+    digest = hashlib.sha256()
+    for source in sources:
+        if isinstance(source, Path):
+            with open(source, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(block)
+        elif isinstance(source, np.ndarray):
+            digest.update(str(source.dtype).encode())
+            digest.update(np.ascontiguousarray(source).tobytes())
+        else:
+            digest.update(json.dumps(source, sort_keys=True, default=str).encode())
+        # Separates the sources, so moving bytes between them changes the hash
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class ArtifactCache:
+    """
+    Content-addressed cache of mined itemsets, rules and rule indexes on disk.
+    An entry is a directory of .npy files named after the hash of the input data, the miner and its parameters,
+    so a change of any of them gives another entry. The arrays are memory-mapped when they are loaded.
+    Entries of another VERSION or without complete metadata are stale and removed, the least recently used
+    entries are evicted when the cache grows beyond max_bytes. Pinned entries are in use, e.g. by the workers of a
+    GridExecutor, and are never evicted.
+    """
+
+    def __init__(self, directory, max_bytes=1 << 30):
+        """
+        :param directory: directory of the cache, created if it doesn't exist
+        :param max_bytes: maximum total size of the entries
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        # Number of users of every pinned entry
+        self.pinned = Counter()
+
+    @staticmethod
+    def key(data, miner, **params):
+        """
+        Returns the key of an artifact.
+        :param data: fingerprint of the input data, see fingerprint
+        :param miner: name of the miner or stage that makes the artifact
+        :param params: parameters of the miner
+        :return: hex digest
+        """
+        return fingerprint(data, miner, params)
+
+    def path(self, key):
+        return self.directory / key
+
+    def get(self, key, names):
+        """
+        Looks up an entry, a stale entry is removed.
+        :param key: key of the entry
+        :param names: names of the arrays the entry must have
+        :return: directory of the entry or None if there is no valid entry
+        """
+        path = self.path(key)
+        if not self.valid(path, names):
+            if path.exists():
+                shutil.rmtree(path, ignore_errors=True)
+            self.misses += 1
+            return None
+        # The modification time of the metadata is the last use of the entry
+        os.utime(path / "meta.json")
+        self.hits += 1
+        return path
+
+    def put(self, key, write, **meta):
+        """
+        Writes a new entry, the entry only appears once it is complete.
+        :param key: key of the entry
+        :param write: function that writes the arrays of the entry in the directory it is given
+        :param meta: JSON serializable description of the entry
+        :return: directory of the entry
+        """
+        path = self.path(key)
+        temporary = Path(tempfile.mkdtemp(prefix=f".{key}.", dir=self.directory))
+        try:
+            write(temporary)
+            with open(temporary / "meta.json", "w") as f:
+                json.dump({"version": VERSION, "created": time.time(), **meta}, f, default=str)
+            if path.exists():
+                shutil.rmtree(path, ignore_errors=True)
+            os.replace(temporary, path)
+        finally:
+            shutil.rmtree(temporary, ignore_errors=True)
+        self.evict(keep=key)
+        return path
+
+    @staticmethod
+    def valid(path, names):
+        try:
+            with open(path / "meta.json") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return False
+        return meta.get("version") == VERSION and all((path / f"{name}.npy").exists() for name in names)
+
+    def entries(self):
+        """
+        Returns the entries of the cache, the least recently used first.
+        :return: list of (last use, size in bytes, directory)
+        """
+        entries = []
+        for path in self.directory.iterdir():
+            if path.name.startswith(".") or not path.is_dir():
+                continue
+            try:
+                last_use = (path / "meta.json").stat().st_mtime
+            except OSError:
+                # An entry without metadata is incomplete
+                last_use = 0
+            size = sum(file.stat().st_size for file in path.iterdir())
+            entries.append((last_use, size, path))
+        entries.sort()
+        return entries
+
+    def pin(self, key):
+        """
+        Protects an entry from eviction until it is unpinned as many times as it was pinned.
+        """
+        self.pinned[key] += 1
+
+    def unpin(self, key):
+        self.pinned[key] -= 1
+        if self.pinned[key] <= 0:
+            del self.pinned[key]
+
+    def evict(self, keep=None):
+        """
+        Removes the least recently used entries until the cache fits in max_bytes.
+        :param keep: key of an entry that is never removed, e.g. the one that was just written
+        """
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if path.name == keep or path.name in self.pinned:
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+    def clear(self):
+        for _, _, path in self.entries():
+            shutil.rmtree(path, ignore_errors=True)
+
+    def itemsets(self, key, mine, **meta):
+        """
+        Returns cached frequent itemsets, mining them on a miss.
+        :param key: key of the itemsets
+        :param mine: function without arguments that returns the frequent itemsets (sorted tuples of item codes)
+                     and their supports
+        :param meta: description of the entry
+        :return: frequent itemsets as tuples and their supports
+        """
+        path = self.get(key, ITEMSET_ARRAYS)
+        if path is None:
+            table = ItemsetTable(*mine())
+            arrays = {"indptr": table.indptr, "indices": table.indices, "supports": np.asarray(table.supports)}
+            path = self.put(key, lambda directory: [np.save(directory / f"{name}.npy", array)
+                                                    for name, array in arrays.items()], **meta)
+        arrays = {name: np.load(path / f"{name}.npy", mmap_mode="r") for name in ITEMSET_ARRAYS}
+        table = ItemsetTable.from_arrays(arrays["indptr"], arrays["indices"], arrays["supports"])
+        return table.itemsets, np.asarray(arrays["supports"])
+
+    def rules(self, key, generate, **meta):
+        """
+        Returns the directory of a cached rule store, generating the rules on a miss.
+        Load the store with RuleStore.load, its rule index is cached along with the rules.
+        :param key: key of the rules
+        :param generate: function without arguments that returns the RuleStore
+        :param meta: description of the entry
+        :return: directory of the entry
+        """
+        path = self.get(key, ARRAYS + INDEX_ARRAYS)
+        if path is None:
+            path = self.put(key, generate().save, **meta)
+        return path
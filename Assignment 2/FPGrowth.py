@@ -0,0 +1,122 @@
+from collections import Counter
+from pathlib import Path
+
+from Instrumentation import instrumentation
+from utils import iter_transactions
+
+
+class FPNode:
+    """
+    Node of an FP-tree, the path from the root to a node is a prefix of the transactions that contain it.
+    """
+    __slots__ = ("item", "count", "parent", "children")
+
+    def __init__(self, item, parent):
+        self.item = item
+        self.count = 0
+        self.parent = parent
+        self.children = dict()
+
+
+def build_tree(weighted_transactions, item_counts, min_count):
+    """
+    Builds an FP-tree from the transactions, the infrequent items are left out.
+    :param weighted_transactions: iterable of (items, count) pairs
+    :param item_counts: support of every item in the transactions
+    :param min_count: minimum absolute support of an item
+    :return: root of the tree and the header table, which maps every frequent item to its nodes in the tree
+    """
+    frequent_items = sorted((item for item, count in item_counts.items() if count >= min_count),
+                            key=lambda item: (-item_counts[item], item))
+    # Items are inserted from most to least frequent, so transactions share as many nodes as possible
+    order = {item: rank for rank, item in enumerate(frequent_items)}
+    root = FPNode(None, None)
+    header = {item: [] for item in frequent_items}
+    for items, count in weighted_transactions:
+        node = root
+        for item in sorted((item for item in items if item in order), key=order.__getitem__):
+            child = node.children.get(item)
+            if child is None:
+                child = FPNode(item, node)
+                node.children[item] = child
+                header[item].append(child)
+            child.count += count
+            node = child
+    return root, header
+
+
+def mine_tree(header, suffix, min_count, result):
+    """
+    Adds all frequent itemsets of the FP-tree, extended with the suffix, to the result.
+    :param header: header table of the FP-tree
+    :param suffix: itemset the transactions in the tree are conditioned on
+    :param min_count: minimum absolute support of an itemset
+    :param result: dict mapping the frequent itemsets to their absolute support
+    """
+    # The header is ordered from most to least frequent, start with the items at the bottom of the tree
+    for item in reversed(list(header)):
+        nodes = header[item]
+        itemset = suffix | {item}
+        result[itemset] = sum(node.count for node in nodes)
+
+        # The prefix paths of the nodes of the item form the transactions of the conditional tree
+        pattern_base = []
+        item_counts = Counter()
+        for node in nodes:
+            path = []
+            parent = node.parent
+            while parent.item is not None:
+                path.append(parent.item)
+                parent = parent.parent
+            if path:
+                pattern_base.append((path, node.count))
+                for path_item in path:
+                    item_counts[path_item] += node.count
+        if any(count >= min_count for count in item_counts.values()):
+            instrumentation.count("conditional_patterns", len(pattern_base))
+            _, conditional_header = build_tree(pattern_base, item_counts, min_count)
+            mine_tree(conditional_header, itemset, min_count, result)
+
+
+def fp_growth(transactions, min_support):
+    """
+    Runs the FP-growth algorithm.
+    The transactions are only scanned twice, once to count the items and once to build the FP-tree.
+    :param transactions: list of transactions, a TransactionDatabase or the filename of a transaction file
+    :param min_support: minimum relative support of a frequent itemset
+    :return: frequent itemsets and frequent itemsets by length, both as dicts mapping itemsets to their relative support
+    """
+    if isinstance(transactions, (str, Path)):
+        scan = lambda: iter_transactions(transactions)
+    else:
+        scan = lambda: iter(transactions)
+
+    with instrumentation.stage("fpgrowth", min_support=min_support):
+        n_transactions = 0
+        item_counts = Counter()
+        for transaction in scan():
+            n_transactions += 1
+            item_counts.update(transaction)
+        if n_transactions == 0:
+            return dict(), [dict()]
+
+        # Smallest absolute support of which the relative support passes the same test as in itemsets_support
+        min_count = max(int(min_support * n_transactions), 0)
+        while min_count > 0 and (min_count - 1) / n_transactions >= min_support:
+            min_count -= 1
+        while min_count / n_transactions < min_support:
+            min_count += 1
+
+        _, header = build_tree(((transaction, 1) for transaction in scan()), item_counts, min_count)
+        result = dict()
+        mine_tree(header, frozenset(), min_count, result)
+
+        frequent_itemsets = {itemset: count / n_transactions for itemset, count in result.items()}
+        itemsets_by_length = [dict()]
+        for itemset, support in frequent_itemsets.items():
+            while len(itemsets_by_length) <= len(itemset):
+                itemsets_by_length.append(dict())
+            itemsets_by_length[len(itemset)][itemset] = support
+        for k, itemsets in enumerate(itemsets_by_length[1:], 1):
+            instrumentation.count(f"itemsets_level_{k}", len(itemsets))
+    return frequent_itemsets, itemsets_by_length
@@ -0,0 +1,178 @@
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, groupby
+from pathlib import Path
+
+import numpy as np
+
+from BatchRecommendations import BatchRecommender
+from Instrumentation import instrumentation
+from RuleStore import RuleStore
+from utils import support_threshold
+
+# State of a worker process, set once by init_worker so it isn't pickled with every task
+worker_state = dict()
+
+
+def init_worker(baskets, popular_items, strategies, top_ns):
+    worker_state["baskets"] = baskets
+    worker_state["popular_items"] = popular_items
+    worker_state["strategies"] = strategies
+    worker_state["top_ns"] = top_ns
+    worker_state["directory"] = None
+    worker_state["recommenders"] = dict()
+
+
+def recommend_shard(directory, confidence, start, end):
+    """
+    Recommends items for a shard of the baskets with the rules of a published rule store.
+    :param directory: directory the rule store was saved in
+    :param confidence: minimum confidence of the rules
+    :param start: index of the first basket of the shard
+    :param end: index after the last basket of the shard
+    :return: dict mapping every (strategy, top_n) pair to the recommended items of the baskets in the shard
+    """
+    if worker_state["directory"] != directory:
+        # The arrays are memory-mapped, all workers share the pages of the same files
+        worker_state["directory"] = directory
+        worker_state["store"] = RuleStore.load(directory)
+        worker_state["recommenders"] = dict()
+    recommenders = worker_state["recommenders"]
+    if confidence not in recommenders:
+        recommenders[confidence] = BatchRecommender(worker_state["store"].threshold(confidence),
+                                                    worker_state["popular_items"])
+    return recommenders[confidence].recommend_all(worker_state["baskets"][start:end], worker_state["strategies"],
+                                                  worker_state["top_ns"])
+
+
+def shared_directory():
+    # Memory-mapped files in /dev/shm never touch the disk
+    shm = Path("/dev/shm")
+    return tempfile.mkdtemp(prefix="rules_", dir=shm if shm.is_dir() else None)
+
+
+class GridExecutor:
+    """
+    Runs the recommendations of a parameter grid on a pool of processes.
+    Every rule set (min_support, ndi) is generated once in the main process and saved as memory-mapped arrays,
+    the workers load it from there instead of receiving it pickled. The recommendations of every min_confidence
+    are split in shards of baskets, each shard makes the recommendations of all strategies and top_n values.
+    """
+
+    def __init__(self, baskets, popular_items, strategies, top_ns, max_workers=None, shards=None, cache=None,
+                 data=None, dictionary=None):
+        """
+        :param baskets: list of baskets (sets of item codes) to recommend for
+        :param popular_items: items ranked on popularity, for recommend_popularity
+        :param strategies: names of the recommend_* functions to evaluate
+        :param top_ns: numbers of items to recommend per basket
+        :param max_workers: number of worker processes, all cores by default
+        :param shards: number of shards the baskets are split in per rule set, max_workers by default
+        :param cache: ArtifactCache to keep the rule sets in, they are removed after use without one
+        :param data: fingerprint of the data the itemsets were mined from, for the keys of the cache
+        :param dictionary: ItemDictionary of the item codes, saved with every rule set so it can be served
+        """
+        self.baskets = baskets
+        self.popular_items = popular_items
+        self.dictionary = dictionary
+        self.strategies = strategies
+        self.top_ns = top_ns
+        self.cache = cache
+        self.data = data
+        self.max_workers = max_workers or os.cpu_count() or 1
+        shards = min(shards or self.max_workers, max(len(baskets), 1))
+        bounds = [len(baskets) * shard // shards for shard in range(shards + 1)]
+        self.shards = list(zip(bounds, bounds[1:]))
+        self.pool = ProcessPoolExecutor(self.max_workers, initializer=init_worker,
+                                        initargs=(baskets, popular_items, strategies, top_ns))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.pool.shutdown(cancel_futures=True)
+
+    def publish(self, mined_itemsets, support, ndi, min_confidence):
+        """
+        Generates the rules of a rule set and saves them in a new shared directory, or finds them in the cache.
+        A cached rule set is pinned, so the cache doesn't evict it while the workers still have to load it.
+        :return: the directory and whether it is temporary, pass both to release when the workers are done
+        """
+        def generate():
+            frequent_itemsets, support_itemsets = support_threshold(*mined_itemsets[ndi], support)
+            store = RuleStore.from_itemsets(frequent_itemsets, support_itemsets, min_confidence)
+            if self.dictionary is not None:
+                store.items = np.array(self.dictionary.items)
+            if self.popular_items is not None:
+                store.popular_items = np.array(self.popular_items, dtype=np.int64)
+            return store
+
+        params = dict(min_support=support, ndi=ndi, min_confidence=min_confidence)
+        with instrumentation.stage("publish_rules", **params):
+            if self.cache is not None:
+                key = self.cache.key(self.data, "rules", **params)
+                directory = self.cache.rules(key, generate, **params)
+                self.cache.pin(key)
+                return str(directory), False
+            directory = shared_directory()
+            generate().save(directory)
+            return directory, True
+
+    def run(self, mined_itemsets, combinations):
+        """
+        Makes the recommendations of combinations of rule parameters.
+        Consecutive combinations with the same min_support and ndi share their rule set, so the combinations should
+        be ordered with min_confidence changing fastest, see ParameterGrid.
+        The rules of the next rule set are generated while the workers recommend with the current one.
+        :param mined_itemsets: dict mapping ndi to the itemsets and supports sorted on support, see sort_by_support
+        :param combinations: iterable of dicts with a min_support, ndi and min_confidence
+        :return: generator of (params, recommendations) pairs, where the recommendations map every
+                 (strategy, top_n) pair to the recommended items of every basket
+        """
+        rule_sets = groupby(combinations, key=lambda params: (params['min_support'], params['ndi']))
+        pending = None
+        try:
+            for rule_set in chain(rule_sets, [None]):
+                submitted = None
+                if rule_set is not None:
+                    (support, ndi), group = rule_set
+                    group = list(group)
+                    directory, temporary = self.publish(mined_itemsets, support, ndi,
+                                                        min(params['min_confidence'] for params in group))
+                    instrumentation.snapshot("publish_rules")
+                    futures = [(params, [self.pool.submit(recommend_shard, directory, params['min_confidence'],
+                                                          start, end) for start, end in self.shards])
+                               for params in group]
+                    submitted = (directory, temporary, futures)
+
+                collected, pending = pending, submitted
+                if collected is not None:
+                    yield from self.collect(*collected)
+        finally:
+            if pending is not None:
+                self.release(pending[0], pending[1])
+
+    def release(self, directory, temporary):
+        """
+        Removes a temporary rule set or unpins a cached one, once no worker needs it anymore.
+        """
+        if temporary:
+            shutil.rmtree(directory, ignore_errors=True)
+        else:
+            self.cache.unpin(Path(directory).name)
+
+    def collect(self, directory, temporary, futures):
+        try:
+            for params, shard_futures in futures:
+                recommendations = {key: [] for key in
+                                   ((strategy, top_n) for strategy in self.strategies for top_n in self.top_ns)}
+                # The workers recommend in their own processes, only the time spent waiting for them is measured here
+                with instrumentation.stage("recommend_wait", **params):
+                    for future in shard_futures:
+                        for key, recommended in future.result().items():
+                            recommendations[key].extend(recommended)
+                yield params, recommendations
+        finally:
+            self.release(directory, temporary)
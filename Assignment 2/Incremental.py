@@ -0,0 +1,199 @@
+from AntecedentIndex import AntecedentIndex
+from Apriori import count_support, generate_rules, join_set
+from TransactionDatabase import count_items
+
+
+class IncrementalMiner:
+    """
+    Keeps the frequent itemsets of a growing database up to date.
+    Besides the frequent itemsets, the support of the negative border is kept: the infrequent itemsets of which all
+    subsets are frequent. A new batch of transactions only has to be counted for these itemsets.
+    The rest of the database is only counted again when a border itemset becomes frequent,
+    for the new candidates that are made with it.
+    """
+
+    def __init__(self, transactions, min_support):
+        """
+        :param transactions: list of transactions or a TransactionDatabase
+        :param min_support: minimum relative support of a frequent itemset, the same test as apriori
+        """
+        self.min_support = min_support
+        # Every batch is kept, the database is the concatenation of the parts
+        self.parts = [transactions]
+        self.n_transactions = len(transactions)
+        # Absolute support of the frequent itemsets and the negative border, as sorted tuples
+        self.counts = {(item,): count for item, count in count_items(transactions).items()}
+        self.frequent = set()
+        self.border = set()
+        self.extend()
+
+    def is_frequent(self, itemset):
+        return self.counts[itemset] / self.n_transactions >= self.min_support
+
+    def count(self, itemsets):
+        """
+        Counts the support of the itemsets in the whole database.
+        """
+        counts = [0] * len(itemsets)
+        for part in self.parts:
+            counts = [total + count for total, count in zip(counts, count_support(part, itemsets).tolist())]
+        return counts
+
+    def extend(self):
+        """
+        Derives the frequent itemsets and the negative border level-wise from the known supports,
+        candidates without a known support are counted in the whole database.
+        """
+        singletons = [itemset for itemset in self.counts if len(itemset) == 1]
+        level = sorted(itemset for itemset in singletons if self.is_frequent(itemset))
+        # Every infrequent item is in the border, its subset (the empty set) is always frequent
+        frequent = set(level)
+        border = {itemset for itemset in singletons if not self.is_frequent(itemset)}
+        k = 2
+        while level:
+            candidates = join_set(level, k)
+            missing = [candidate for candidate in candidates if candidate not in self.counts]
+            if missing:
+                self.counts.update(zip(missing, self.count(missing)))
+            level = [candidate for candidate in candidates if self.is_frequent(candidate)]
+            frequent.update(level)
+            border.update(candidate for candidate in candidates if not self.is_frequent(candidate))
+            k += 1
+        self.frequent = frequent
+        self.border = border
+        # Itemsets that left the border have an infrequent subset, their support isn't needed anymore
+        self.counts = {itemset: count for itemset, count in self.counts.items()
+                       if itemset in frequent or itemset in border}
+
+    def update(self, transactions):
+        """
+        Adds a batch of transactions to the database.
+        :param transactions: list of transactions or a TransactionDatabase
+        :return: itemsets that became frequent, itemsets that became infrequent
+                 and frequent itemsets of which the support changed
+        """
+        old_frequent = self.frequent
+        old_counts = {itemset: self.counts[itemset] for itemset in old_frequent}
+        tracked = [itemset for itemset in self.counts if len(itemset) > 1]
+        for itemset, count in zip(tracked, count_support(transactions, tracked).tolist()):
+            self.counts[itemset] += count
+        # Items that are new in the batch join the border or the frequent items
+        for item, count in count_items(transactions).items():
+            self.counts[(item,)] = self.counts.get((item,), 0) + count
+
+        self.parts.append(transactions)
+        self.n_transactions += len(transactions)
+        self.extend()
+
+        added = self.frequent - old_frequent
+        removed = old_frequent - self.frequent
+        changed = {itemset for itemset in self.frequent & old_frequent if self.counts[itemset] != old_counts[itemset]}
+        return added, removed, changed
+
+    def frequent_itemsets(self):
+        """
+        :return: frequent itemsets and their absolute supports, like read_frequent_itemsets
+        """
+        itemsets = list(self.frequent)
+        return itemsets, [self.counts[itemset] for itemset in itemsets]
+
+
+class IncrementalRules:
+    """
+    Association rules of the frequent itemsets of an IncrementalMiner, in the format of association_rules and
+    rules_cache, that are patched in place when the miner is updated.
+    A rule keeps its index as long as it exists. Removed rules leave a tombstone (None) in the list of rules and are
+    removed from the cache, so the recommenders never reach them.
+    """
+
+    def __init__(self, miner, min_confidence=0.05):
+        self.miner = miner
+        self.min_confidence = min_confidence
+        # Absolute support of every frequent itemset
+        self.support_dict = {itemset: miner.counts[itemset] for itemset in miner.frequent}
+        self.rules = []
+        self.cache = dict()
+        # Prefix tree over the antecedents, kept up to date with the cache
+        self.index = AntecedentIndex()
+        # Index of every rule of every itemset, by (antecedent, consequent)
+        self.itemset_rules = dict()
+        self.tombstones = 0
+        # Changes with every update of the rules or their indices, e.g. to invalidate a BasketCache
+        self.version = 0
+        for itemset in self.support_dict:
+            self.patch_itemset(itemset)
+
+    def update(self, transactions):
+        """
+        Adds a batch of transactions to the miner and patches the rules of which the itemset changed.
+        :param transactions: list of transactions or a TransactionDatabase
+        """
+        added, removed, changed = self.miner.update(transactions)
+        for itemset in removed:
+            del self.support_dict[itemset]
+        for itemset in added | changed:
+            self.support_dict[itemset] = self.miner.counts[itemset]
+
+        # The confidences of the rules of an itemset depend on the supports of the itemset and its subsets,
+        # only the removed itemsets and the supersets of an added or changed itemset can have changed rules
+        by_first_item = dict()
+        for itemset in added | changed:
+            by_first_item.setdefault(itemset[0], []).append(set(itemset))
+        affected = set(removed)
+        for itemset in self.support_dict:
+            items = set(itemset)
+            if any(subset <= items for item in itemset for subset in by_first_item.get(item, ())):
+                affected.add(itemset)
+        for itemset in affected:
+            self.patch_itemset(itemset)
+        self.version += 1
+
+    def patch_itemset(self, itemset):
+        """
+        Generates the rules of an itemset again, rules that still exist are overwritten at their index.
+        """
+        old = self.itemset_rules.pop(itemset, dict())
+        new = dict()
+        if itemset in self.support_dict:
+            for rule in generate_rules([itemset], self.support_dict, self.min_confidence):
+                key = rule[:2]
+                if key in old:
+                    index = old.pop(key)
+                    self.rules[index] = rule
+                else:
+                    index = len(self.rules)
+                    self.rules.append(rule)
+                    for item in rule[0]:
+                        self.cache.setdefault(item, set()).add(index)
+                    self.index.add(rule[0], index)
+                new[key] = index
+        if new:
+            self.itemset_rules[itemset] = new
+
+        for (antecedent, _), index in old.items():
+            self.rules[index] = None
+            for item in antecedent:
+                self.cache[item].discard(index)
+                if not self.cache[item]:
+                    del self.cache[item]
+            self.index.discard(antecedent, index)
+        self.tombstones += len(old)
+
+    def compact(self):
+        """
+        Removes the tombstones from the list of rules, the rules get new indices.
+        """
+        indices = dict()
+        rules = []
+        for index, rule in enumerate(self.rules):
+            if rule is not None:
+                indices[index] = len(rules)
+                rules.append(rule)
+        self.rules[:] = rules
+        for item, rule_indices in self.cache.items():
+            self.cache[item] = {indices[index] for index in rule_indices}
+        for itemset, itemset_rules in self.itemset_rules.items():
+            self.itemset_rules[itemset] = {key: indices[index] for key, index in itemset_rules.items()}
+        self.index = AntecedentIndex(self.rules)
+        self.tombstones = 0
+        self.version += 1
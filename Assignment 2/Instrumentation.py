@@ -0,0 +1,236 @@
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+
+import numpy as np
+
+# How a stage is measured: only its time, with cProfile or with the sampling profiler
+MODES = ("timer", "cprofile", "sampling")
+
+
+class Sampler:
+    """
+    Statistical profiler: a thread that records the stack of the profiled thread at a fixed interval.
+    Unlike cProfile it doesn't slow down every function call, so the numbers of hot loops stay realistic.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self):
+        thread_id = threading.get_ident()
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self.sample, args=(thread_id,), daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def sample(self, thread_id):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(f"{Path(frame.f_code.co_filename).name}:{frame.f_code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+
+class Instrumentation:
+    """
+    Opt-in timers, counters and memory snapshots of the stages of the mining and recommendation pipeline.
+    Disabled, a stage is a shared empty context manager and a count or snapshot returns immediately, so the hooks can
+    stay in the code. Every stage can be profiled with cProfile or the sampling profiler instead of only being timed.
+    The stages of a run are exported as a Chrome trace (chrome://tracing, Perfetto) with the report as its otherData,
+    the profiles of the stages are written next to it.
+
+    Only the measurements of the current process are collected, not those of the workers of a process pool.
+    """
+
+    def __init__(self):
+        self.memory = False
+        self.configure(enabled=False)
+
+    def configure(self, enabled=True, mode="timer", modes=None, memory=False, interval=0.005):
+        """
+        :param enabled: if False, stages, counts and snapshots aren't measured at all
+        :param mode: mode of every stage without its own mode, one of MODES
+        :param modes: dict mapping the names of stages to their mode
+        :param memory: if True, allocations are traced with tracemalloc for the snapshots, which slows everything down
+        :param interval: seconds between two samples of the sampling profiler
+        """
+        modes = dict(modes or dict())
+        for stage_mode in [mode, *modes.values()]:
+            if stage_mode not in MODES:
+                raise ValueError(f"Unknown mode {stage_mode}, use one of {MODES}")
+        self.enabled = enabled
+        self.mode = mode
+        self.modes = modes
+        self.interval = interval
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        elif not memory and self.memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.memory = memory
+
+        self.start_time = time.perf_counter()
+        # Chrome trace events of the stages and snapshots
+        self.events = []
+        # name -> [calls, total time]
+        self.timers = dict()
+        # name -> [observations, total, max]
+        self.counters = dict()
+        self.snapshots = []
+        self.profiles = dict()
+        # A profiler can't be nested in another one, a stage in a profiled stage is only timed
+        self.profiling = False
+
+    def configure_from_environment(self, variable="INSTRUMENTATION"):
+        """
+        Configures the instrumentation from an environment variable with a comma separated list of options:
+        a mode for all stages, stage=mode for a single stage, memory and interval=seconds.
+        E.g. INSTRUMENTATION="memory,association_rules=cprofile,recommend=sampling"
+        The instrumentation stays disabled if the variable isn't set.
+        """
+        options = os.environ.get(variable)
+        if not options:
+            return
+        mode = "timer"
+        modes = dict()
+        memory = False
+        interval = 0.005
+        for option in options.split(","):
+            name, _, value = option.strip().partition("=")
+            if not value:
+                if name == "memory":
+                    memory = True
+                elif name:
+                    mode = name
+            elif name == "interval":
+                interval = float(value)
+            else:
+                modes[name] = value
+        self.configure(True, mode, modes, memory, interval)
+
+    def timestamp(self):
+        return (time.perf_counter() - self.start_time) * 1e6
+
+    def stage(self, name, **args):
+        """
+        Measures the code in a with block as a stage.
+        :param name: name of the stage, the stages with the same name are aggregated
+        :param args: extra information of this call of the stage, e.g. its parameters, added to the trace
+        :return: context manager
+        """
+        if not self.enabled:
+            return nullcontext()
+        return self.measure_stage(name, args)
+
+    @contextmanager
+    def measure_stage(self, name, args):
+        mode = self.modes.get(name, self.mode)
+        profiler = None
+        if mode != "timer" and not self.profiling:
+            self.profiling = True
+            if mode == "cprofile":
+                profiler = self.profiles.setdefault(name, cProfile.Profile())
+                profiler.enable()
+            else:
+                profiler = self.profiles.setdefault(name, Sampler(self.interval))
+                profiler.start()
+        start = self.timestamp()
+        try:
+            yield
+        finally:
+            duration = self.timestamp() - start
+            if profiler is not None:
+                if mode == "cprofile":
+                    profiler.disable()
+                else:
+                    profiler.stop()
+                self.profiling = False
+            timer = self.timers.setdefault(name, [0, 0.0])
+            timer[0] += 1
+            timer[1] += duration / 1e6
+            self.events.append({"name": name, "ph": "X", "ts": start, "dur": duration, "pid": os.getpid(),
+                                "tid": threading.get_ident(), "args": args})
+
+    def count(self, name, values=1):
+        """
+        Adds observations to a counter, e.g. the number of candidates of a level or the fired rules of a basket.
+        :param values: a number or an array with a number per observation
+        """
+        if not self.enabled:
+            return
+        values = np.atleast_1d(values)
+        if len(values) == 0:
+            return
+        counter = self.counters.setdefault(name, [0, 0, 0])
+        counter[0] += len(values)
+        counter[1] += values.sum().item()
+        counter[2] = max(counter[2], values.max().item())
+
+    def snapshot(self, name):
+        """
+        Records the memory in use at a stage boundary and the peak since the previous snapshot, if memory is traced.
+        :param name: name of the boundary, e.g. the stage that just ended
+        """
+        if not self.enabled or not self.memory:
+            return
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        self.snapshots.append({"name": name, "time": self.timestamp() / 1e6, "memory": current, "peak": peak})
+        self.events.append({"name": "memory", "ph": "C", "ts": self.timestamp(), "pid": os.getpid(),
+                            "args": {"memory": current}})
+
+    def report(self):
+        """
+        :return: the stages, counters and snapshots as tables
+        """
+        lines = [f"{'stage':<30}{'calls':>8}{'time (s)':>12}{'mean (s)':>12}"]
+        for name, (calls, total) in sorted(self.timers.items(), key=lambda timer: -timer[1][1]):
+            lines.append(f"{name:<30}{calls:>8}{total:>12.4f}{total / calls:>12.6f}")
+        if self.counters:
+            lines.append(f"{'counter':<30}{'count':>8}{'total':>12}{'mean':>12}{'max':>12}")
+            for name, (observations, total, maximum) in self.counters.items():
+                lines.append(f"{name:<30}{observations:>8}{total:>12g}{total / observations:>12.2f}{maximum:>12g}")
+        if self.snapshots:
+            lines.append(f"{'snapshot':<30}{'time (s)':>8}{'memory (MB)':>12}{'peak (MB)':>12}")
+            for snapshot in self.snapshots:
+                lines.append(f"{snapshot['name']:<30}{snapshot['time']:>8.1f}{snapshot['memory'] / 2 ** 20:>12.1f}"
+                             f"{snapshot['peak'] / 2 ** 20:>12.1f}")
+        return "\n".join(lines)
+
+    def export(self, filename):
+        """
+        Writes the trace of the run, with the timers, counters and snapshots as its otherData. The cProfile profiles
+        are written as <name>.<stage>.prof (pstats, snakeviz) and the samples as <name>.<stage>.folded
+        (flamegraph.pl, speedscope) next to it.
+        """
+        path = Path(filename)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = {"timers": self.timers, "counters": self.counters, "snapshots": self.snapshots}
+        with open(path, "w") as f:
+            json.dump({"traceEvents": self.events, "displayTimeUnit": "ms", "otherData": data}, f)
+        for name, profiler in self.profiles.items():
+            if isinstance(profiler, Sampler):
+                path.with_name(f"{path.stem}.{name}.folded").write_text(
+                    "".join(f"{stack} {count}\n" for stack, count in profiler.stacks.most_common()))
+            else:
+                profiler.dump_stats(path.with_name(f"{path.stem}.{name}.prof"))
+
+
+# Instrumentation of the process, the hooks in the pipeline all report to it
+instrumentation = Instrumentation()
@@ -0,0 +1,140 @@
+from itertools import chain
+
+import numpy as np
+
+from TransactionDatabase import count_items
+
+
+class ItemDictionary:
+    """
+    Maps the item ids of a dataset to dense codes 0..n-1, the most frequent item gets code 0.
+    Itemsets are encoded as sorted tuples of codes, every code is a single shared int object,
+    so an encoded itemset only costs the tuple itself.
+    """
+
+    def __init__(self, items):
+        self.items = list(items)
+        self.codes = {item: code for code, item in enumerate(self.items)}
+
+    @classmethod
+    def from_transactions(cls, transactions):
+        """
+        Builds the dictionary of all items in the transactions.
+        :param transactions: list of transactions or a TransactionDatabase
+        :return: item dictionary
+        """
+        return cls.from_counts(count_items(transactions))
+
+    @classmethod
+    def from_counts(cls, counts):
+        """
+        Builds the dictionary of counted items, e.g. the sum of the counts of several databases.
+        :param counts: dict mapping every item to its number of occurrences
+        :return: item dictionary
+        """
+        return cls(sorted(counts, key=lambda item: (-counts[item], item)))
+
+    def __len__(self):
+        return len(self.items)
+
+    def encode(self, items):
+        """
+        Encodes an itemset, items that are not in the dictionary are left out.
+        :param items: itemset of item ids
+        :return: sorted tuple of codes
+        """
+        codes = self.codes
+        return tuple(sorted(codes[item] for item in items if item in codes))
+
+    def encode_transactions(self, transactions):
+        """
+        Encodes transactions, the encoded transactions are sets of codes so they can be mined and used as baskets.
+        :param transactions: list of transactions
+        :return: list of encoded transactions
+        """
+        return [set(self.encode(transaction)) for transaction in transactions]
+
+    def decode(self, codes):
+        """
+        Decodes an encoded itemset.
+        :param codes: codes of the itemset
+        :return: frozenset of item ids
+        """
+        return frozenset(self.items[code] for code in codes)
+
+
+class ItemsetTable:
+    """
+    Compact container for a collection of itemsets of integer items (codes) and their supports.
+    Every itemset is stored once as a sorted tuple, other structures refer to it by its id (position in the table).
+    The items of all itemsets are also kept in one array in CSR layout, itemset i holds indices[indptr[i]:indptr[i+1]].
+    Looking up an itemset gives its support, so the table can be used wherever a support_dict is expected.
+    """
+
+    def __init__(self, itemsets, supports):
+        self.itemset_tuples = [self.key(itemset) for itemset in itemsets]
+        self.itemset_ids = None
+        self.supports = np.asarray(supports).tolist()
+
+        lengths = np.fromiter(map(len, self.itemset_tuples), dtype=np.int64, count=len(self.itemset_tuples))
+        self.indptr = np.zeros(len(self.itemset_tuples) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=self.indptr[1:])
+        self.indices = np.fromiter(chain(*self.itemset_tuples), dtype=np.int32, count=self.indptr[-1])
+
+    @classmethod
+    def from_arrays(cls, indptr, indices, supports):
+        """
+        Builds a table from its CSR arrays, e.g. arrays that were memory-mapped from disk.
+        The tuples and the ids of the itemsets are only built when they are used.
+        :param indptr: start of every itemset in indices, and the end of the last one
+        :param indices: items of all itemsets
+        :param supports: support of every itemset
+        :return: itemset table
+        """
+        table = cls.__new__(cls)
+        table.itemset_tuples = None
+        table.itemset_ids = None
+        table.supports = np.asarray(supports).tolist()
+        table.indptr = indptr
+        table.indices = indices
+        return table
+
+    @property
+    def itemsets(self):
+        if self.itemset_tuples is None:
+            items = self.indices.tolist()
+            bounds = self.indptr.tolist()
+            self.itemset_tuples = [tuple(items[start:end]) for start, end in zip(bounds, bounds[1:])]
+        return self.itemset_tuples
+
+    @property
+    def ids(self):
+        # The dict keeps the hash of every itemset, it is only computed once
+        if self.itemset_ids is None:
+            self.itemset_ids = {itemset: index for index, itemset in enumerate(self.itemsets)}
+        return self.itemset_ids
+
+    def __len__(self):
+        return len(self.supports)
+
+    def __contains__(self, itemset):
+        return self.key(itemset) in self.ids
+
+    def __getitem__(self, itemset):
+        return self.supports[self.ids[self.key(itemset)]]
+
+    def __iter__(self):
+        return iter(self.itemsets)
+
+    @staticmethod
+    def key(itemset):
+        """
+        Returns the sorted tuple under which an itemset is stored, tuples are expected to be sorted already.
+        """
+        return itemset if isinstance(itemset, tuple) else tuple(sorted(itemset))
+
+    def id(self, itemset):
+        """
+        Returns the id of an itemset in the table.
+        """
+        return self.ids[self.key(itemset)]
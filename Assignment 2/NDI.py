@@ -0,0 +1,111 @@
+import numpy as np
+
+from Apriori import join_set, transaction_bitmaps, count_support, popcount
+from TransactionStream import TransactionStream
+from TransactionDatabase import count_items
+
+
+def deduction_rules(k):
+    """
+    Returns the coefficients of the deduction rules for an itemset I of size k.
+    The subsets of I are encoded as bitmasks over the positions of the items in I. For every X strictly contained
+    in I the rule is the sum over X <= J < I of (-1)^(|I - J| + 1) * support(J), which is an upper bound on the
+    support of I if |I - X| is odd and a lower bound if |I - X| is even.
+    :param k: size of the itemset
+    :return: coefficient matrix with a row per X and a column per J, and a mask of the rows that are upper bounds
+    """
+    full = (1 << k) - 1
+    masks = np.arange(full + 1, dtype=np.uint64)
+    # Number of items of I that are not in the subset, for every subset
+    missing = k - popcount(masks[:, None])
+    contains = (masks[None, :] & masks[:, None]) == masks[:, None]
+    coefficients = np.where(contains, np.where(missing[None, :] % 2 == 1, 1, -1), 0).astype(np.int64)
+    coefficients[:, full] = 0
+    return coefficients[:full], missing[:full] % 2 == 1
+
+
+def subset_positions(k):
+    """
+    Returns the positions of the items in every subset of an itemset of size k, indexed by the bitmask of the subset.
+    """
+    return [tuple(position for position in range(k) if mask >> position & 1) for mask in range(1 << k)]
+
+
+def itemset_bounds(candidates, supports, batch_size=4096):
+    """
+    Computes the lower and upper bound on the support of the candidates with the deduction rules.
+    All rules of a batch of candidates are evaluated as one matrix product.
+    :param candidates: list of itemsets of size k as sorted tuples
+    :param supports: dict mapping all strict subsets of the candidates, as sorted tuples, to their absolute support
+    :param batch_size: number of candidates of which the bounds are computed at once
+    :return: lower bounds and upper bounds
+    """
+    k = len(candidates[0])
+    coefficients, upper = deduction_rules(k)
+    # The support of the candidate itself is not known, it is multiplied by 0 in every rule
+    positions = subset_positions(k)[:-1]
+
+    lower_bounds = np.empty(len(candidates), dtype=np.int64)
+    upper_bounds = np.empty(len(candidates), dtype=np.int64)
+    for start in range(0, len(candidates), batch_size):
+        batch = candidates[start:start + batch_size]
+        subset_supports = np.zeros((len(batch), len(positions) + 1), dtype=np.int64)
+        subset_supports[:, :-1] = [[supports[tuple(candidate[p] for p in subset)] for subset in positions]
+                                   for candidate in batch]
+        bounds = subset_supports @ coefficients.T
+        lower_bounds[start:start + len(batch)] = np.maximum(bounds[:, ~upper].max(axis=1), 0)
+        upper_bounds[start:start + len(batch)] = bounds[:, upper].min(axis=1)
+    return lower_bounds, upper_bounds
+
+
+def non_derivable_itemsets(transactions, min_support, max_size=None):
+    """
+    Mines the frequent non-derivable itemsets, replaces the ndi program of Calders and Goethals.
+    An itemset is derivable if the deduction rules give the same lower and upper bound on its support,
+    derivable itemsets are never counted and can't be extended to non-derivable itemsets.
+    :param transactions: list of transactions, a TransactionDatabase or a TransactionStream
+    :param min_support: minimum absolute support of a frequent itemset
+    :param max_size: maximum size of the itemsets, no maximum if None
+    :return: frequent non-derivable itemsets and their supports, like read_frequent_itemsets
+    """
+    supports = {(): len(transactions)}
+    item_counts = count_items(transactions)
+    # The bounds of a single item are 0 and the number of transactions, it is only derivable if they are equal
+    level = [((item,), count) for item, count in item_counts.items() if count >= min_support]
+    vertical = None
+    if not isinstance(transactions, TransactionStream):
+        vertical = transaction_bitmaps(transactions, [itemset[0] for itemset, _ in level])
+
+    frequent_itemsets = []
+    support_itemsets = []
+    k = 1
+    while level:
+        for itemset, support in level:
+            supports[itemset] = support
+            frequent_itemsets.append(frozenset(itemset))
+            support_itemsets.append(support)
+        # If the support of an itemset equals one of its bounds, all its supersets are derivable
+        if k == 1:
+            extendable = [itemset for itemset, support in level if support != len(transactions)]
+        else:
+            extendable = [itemset for (itemset, support), lower, upper in zip(level, lower_bounds, upper_bounds)
+                          if lower < support < upper]
+
+        k += 1
+        if max_size is not None and k > max_size:
+            break
+        candidates = join_set(extendable, k)
+        if not candidates:
+            break
+        lower_bounds, upper_bounds = itemset_bounds(candidates, supports)
+        # Only count the non-derivable candidates that can still be frequent
+        keep = (lower_bounds < upper_bounds) & (upper_bounds >= min_support)
+        candidates = [candidate for candidate, counted in zip(candidates, keep) if counted]
+        lower_bounds, upper_bounds = lower_bounds[keep], upper_bounds[keep]
+        counts = count_support(transactions, candidates, vertical).tolist()
+
+        frequent = [support >= min_support for support in counts]
+        level = [(candidate, support) for candidate, support, is_frequent in zip(candidates, counts, frequent)
+                 if is_frequent]
+        lower_bounds, upper_bounds = lower_bounds[frequent], upper_bounds[frequent]
+    return frequent_itemsets, support_itemsets
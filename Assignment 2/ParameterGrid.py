@@ -1,35 +1,83 @@
 # Modified from https://github.com/thdaele/Information-Retrieval-Project/blob/main/src/utils.py
 # to make it work with tqdm
+import json
+from pathlib import Path
 
 
 class ParameterGrid:
-    def __init__(self, grid):
-        self.grid = grid.values()
-        self.meaning = grid.keys()
+    """
+    Cross-product of parameter values, numbered as a mixed-radix number with a digit per parameter.
+    By default the first parameter changes fastest. With costs, the parameters that are expensive to change
+    (e.g. mining or rule generation) change slowest, so the combinations that share them are next to each other.
+    """
+
+    def __init__(self, grid, costs=None):
+        """
+        :param grid: dict mapping every parameter to its list of values
+        :param costs: dict mapping parameters to the cost of changing them, parameters without a cost cost 0
+        """
+        self.grid = [list(values) for values in grid.values()]
+        self.meaning = list(grid.keys())
 
         self.counts = [len(a) for a in self.grid]
 
-    def __iter__(self):
-        self.indices = [0 for _ in self.counts]
-        self.position = 0
+        # Parameters in the order of their digits, the fastest changing first
+        self.order = list(range(len(self.meaning)))
+        if costs is not None:
+            self.order.sort(key=lambda position: costs.get(self.meaning[position], 0))
+        self.strides = [0] * len(self.counts)
+        stride = 1
+        for position in self.order:
+            self.strides[position] = stride
+            stride *= self.counts[position]
 
-        self.indices[0] = -1
+    def indices(self, index):
+        """
+        Returns the index of the value of every parameter of a combination.
+        :param index: index of the combination
+        :return: list with a value index per parameter
+        """
+        return [index // stride % count for stride, count in zip(self.strides, self.counts)]
 
-        return self
+    def index(self, params):
+        """
+        Returns the index of a combination, the inverse of grid[index].
+        :param params: dict mapping every parameter to its value
+        :return: index of the combination
+        """
+        return sum(values.index(params[m]) * stride for values, m, stride in zip(self.grid, self.meaning, self.strides))
 
-    def repeat(self, index):
-        if index >= len(self.counts):
-            raise StopIteration()
+    def shard(self, k, n):
+        """
+        Splits the grid in n contiguous shards, so the combinations of a shard share as many expensive parameters
+        as possible.
+        :param k: shard number, 0 <= k < n
+        :param n: number of shards
+        :return: list with the combinations of shard k
+        """
+        if not 0 <= k < n:
+            raise ValueError("Invalid shard")
+        return self[len(self) * k // n:len(self) * (k + 1) // n]
 
-        self.indices[index] += 1
-        if self.indices[index] >= self.counts[index]:
-            self.indices[index] = 0
-            self.repeat(index + 1)
+    def describe(self, index):
+        """
+        Returns a combination with functions replaced by their names, so it can be written as JSON.
+        """
+        return {m: getattr(v, "__name__", v) for m, v in self[index].items()}
 
-    def __next__(self):
-        self.repeat(self.position)
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("Grid index out of range")
 
-        return {m: g[i] for i, g, m in zip(self.indices, self.grid, self.meaning)}
+        return {m: g[i] for i, g, m in zip(self.indices(index), self.grid, self.meaning)}
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
 
     def __len__(self):
         result = 1
@@ -38,6 +86,74 @@ class ParameterGrid:
         return result
 
 
+class Checkpoint:
+    """
+    Records the completed combinations of a grid, with a result for each, in a file of JSON lines.
+    Every completed combination is appended immediately, so a sweep that stopped can resume where it stopped.
+    Recorded combinations that no longer match the grid or that were computed on other data are ignored.
+    """
+
+    def __init__(self, path, grid, fingerprint=None):
+        """
+        :param path: file of the checkpoint
+        :param grid: ParameterGrid of the sweep
+        :param fingerprint: fingerprint of everything the results depend on besides the parameters of the grid,
+                            e.g. the input data, see Cache.fingerprint
+        """
+        self.path = Path(path)
+        self.grid = grid
+        self.fingerprint = fingerprint
+        self.done = dict()
+        if self.path.exists():
+            with open(self.path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # The last line may have been cut off by the crash
+                        continue
+                    index = entry["index"]
+                    if entry.get("fingerprint") != fingerprint:
+                        continue
+                    if index < len(grid) and entry["params"] == grid.describe(index):
+                        self.done[index] = entry["result"]
+
+    def add(self, index, result=None):
+        """
+        Records a combination as completed.
+        :param index: index of the combination in the grid
+        :param result: JSON serializable result of the combination
+        """
+        self.done[index] = result
+        with open(self.path, "a") as f:
+            f.write(json.dumps({"index": index, "params": self.grid.describe(index), "fingerprint": self.fingerprint,
+                                "result": result}) + "\n")
+
+    def pending(self):
+        """
+        Returns the combinations of the grid that aren't completed yet.
+        :return: generator of (index, params) pairs
+        """
+        for index in range(len(self.grid)):
+            if index not in self.done:
+                yield index, self.grid[index]
+
+    def remove(self):
+        """
+        Removes the checkpoint file, e.g. when the sweep has completed.
+        """
+        self.path.unlink(missing_ok=True)
+
+    def __contains__(self, index):
+        return index in self.done
+
+    def __getitem__(self, index):
+        return self.done[index]
+
+    def __len__(self):
+        return len(self.done)
+
+
 if __name__ == '__main__':
     for i in ParameterGrid({
         'test': [1, 2, 3],
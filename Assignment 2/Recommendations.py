@@ -1,150 +1,145 @@
+from itertools import filterfalse
+
 from sklearn.model_selection import train_test_split
 
+from AntecedentIndex import AntecedentIndex
 from Apriori import association_rules, read_transactions
+from Instrumentation import instrumentation
 from utils import get_popular_items
 
-popular_items = get_popular_items(50)
+# Most popular items of the dataset, counted the first time recommend_popularity needs them
+popular_items = None
+
+
+# Statistics of a recommendable item that are collected from the fired rules, in this order
+STATISTICS = ("number_rules", "total_confidence", "total_support", "weighted_confidence", "weighted_support", "lift")
+
+# Statistics the recommenders rank on: the primary key and the key used to break ties
+# The averages are the totals divided by the number of rules
+STRATEGIES = {
+    "recommend_average_confidence": ("average_confidence", "average_support"),
+    "recommend_average_support": ("average_support", "average_confidence"),
+    "recommend_total_confidence": ("total_confidence", None),
+    "recommend_total_support": ("total_support", None),
+    "recommend_weighted_confidence": ("weighted_confidence", None),
+    "recommend_weighted_support": ("weighted_support", None),
+    "recommend_number_rules": ("number_rules", None),
+    "recommend_lift": ("lift", None),
+}
+
+
+def item_statistics(input_items, rules, cache, support_dict):
+    """
+    Collects the statistics of every recommendable item in a single pass over the rules that fire for the input items.
+    All recommenders rank the items on these statistics, so the rules only have to be looked up once per basket.
+    :param cache: item to rule indices cache (rules_cache) or an AntecedentIndex
+    :return: dict mapping every item to a list with the values of STATISTICS
+    """
+    if isinstance(cache, AntecedentIndex):
+        # The index only gives the rules of which the whole antecedent is in the basket
+        fired_rules = (rules[index] for index in cache.fired(input_items))
+    else:
+        relevant_rules = set()
+        for item in input_items:
+            if item in cache:
+                relevant_rules.update(cache[item])
+        fired_rules = (rule for rule in map(rules.__getitem__, relevant_rules) if input_items.issuperset(rule[0]))
+    if instrumentation.enabled:
+        fired_rules = list(fired_rules)
+        instrumentation.count("fired_rules", len(fired_rules))
+
+    statistics = {}
+    for antecedent, consequent, support, confidence in fired_rules:
+        weight = 1 + len(input_items.intersection(consequent))
+        lift = confidence / support_dict[antecedent]
+        for item in filterfalse(input_items.__contains__, consequent):
+            if item not in statistics:
+                statistics[item] = [0, 0, 0, 0, 0, 0]
+            item_statistic = statistics[item]
+            item_statistic[0] += 1
+            item_statistic[1] += confidence
+            item_statistic[2] += support
+            item_statistic[3] += weight * confidence
+            item_statistic[4] += weight * support
+            item_statistic[5] += lift
+    return statistics
+
+
+def statistic_getter(name):
+    """
+    Returns a function that reads the statistic with the given name from the statistics of an item.
+    """
+    if name.startswith("average_"):
+        total = STATISTICS.index(name.replace("average_", "total_"))
+        return lambda item_statistic: item_statistic[total] / item_statistic[0]
+    index = STATISTICS.index(name)
+    return lambda item_statistic: item_statistic[index]
+
+
+def rank_items(statistics, strategy, top_n=5):
+    """
+    Ranks the items on the statistics of a strategy, in descending order.
+    :param statistics: statistics as returned by item_statistics
+    :param strategy: name of the recommender
+    :param top_n: number of items to return
+    :return: top n items
+    """
+    getters = [statistic_getter(name) for name in STRATEGIES[strategy] if name is not None]
+    sorted_recommendations = sorted(statistics.items(),
+                                    key=lambda x: tuple(-getter(x[1]) for getter in getters))
+    return [item for item, _ in sorted_recommendations[:top_n]]
+
+
+def recommend_all(input_items, rules, cache, support_dict, top_n=5):
+    """
+    Makes the recommendations of every strategy from a single pass over the rules.
+    :return: dict mapping the name of every recommender to its recommended items
+    """
+    statistics = item_statistics(input_items, rules, cache, support_dict)
+    recommendations = {strategy: rank_items(statistics, strategy, top_n) for strategy in STRATEGIES}
+    recommendations["recommend_popularity"] = recommend_popularity(input_items, rules, cache, support_dict, top_n)
+    return recommendations
 
 
 def recommend_average_confidence(input_items, rules, cache, support_dict, top_n=5):
-    relevant_rules = set()
-    for item in input_items:
-        if item in cache:
-            relevant_rules |= cache[item]
-
-    recommendations = {}
-    for index in relevant_rules:
-        antecedent, consequent, support, confidence = rules[index]
-        if antecedent.issubset(input_items):
-            for item in consequent - input_items:
-                if item not in recommendations:
-                    recommendations[item] = []
-                recommendations[item].append((confidence, support))
-    recommendations = {
-        item: (
-            sum(conf for conf, _ in item_rules) / len(item_rules), sum(sup for _, sup in item_rules) / len(item_rules))
-        for item, item_rules in recommendations.items()
-    }
-    sorted_recommendations = sorted(recommendations.items(), key=lambda x: (-x[1][0], -x[1][1]))
-    return [item for item, _ in sorted_recommendations[:top_n]]
+    statistics = item_statistics(input_items, rules, cache, support_dict)
+    return rank_items(statistics, "recommend_average_confidence", top_n)
 
 
 def recommend_average_support(input_items, rules, cache, support_dict, top_n=5):
-    relevant_rules = set()
-    for item in input_items:
-        if item in cache:
-            relevant_rules |= cache[item]
-
-    recommendations = {}
-    for index in relevant_rules:
-        antecedent, consequent, support, confidence = rules[index]
-        if antecedent.issubset(input_items):
-            for item in consequent - input_items:
-                if item not in recommendations:
-                    recommendations[item] = []
-                recommendations[item].append((confidence, support))
-    recommendations = {
-        item: (
-            sum(conf for conf, _ in item_rules) / len(item_rules), sum(sup for _, sup in item_rules) / len(item_rules))
-        for item, item_rules in recommendations.items()
-    }
-    sorted_recommendations = sorted(recommendations.items(), key=lambda x: (-x[1][1], -x[1][0]))
-    return [item for item, _ in sorted_recommendations[:top_n]]
+    statistics = item_statistics(input_items, rules, cache, support_dict)
+    return rank_items(statistics, "recommend_average_support", top_n)
 
 
 def recommend_total_confidence(input_items, rules, cache, support_dict, top_n=5):
-    relevant_rules = set()
-    for item in input_items:
-        if item in cache:
-            relevant_rules |= cache[item]
-
-    recommendations = {}
-    for index in relevant_rules:
-        antecedent, consequent, support, confidence = rules[index]
-        if antecedent.issubset(input_items):
-            for item in consequent - input_items:
-                if item not in recommendations:
-                    recommendations[item] = 0
-                recommendations[item] += confidence
-    sorted_recommendations = sorted(recommendations.items(), key=lambda x: -x[1])
-    return [item for item, _ in sorted_recommendations[:top_n]]
+    statistics = item_statistics(input_items, rules, cache, support_dict)
+    return rank_items(statistics, "recommend_total_confidence", top_n)
 
 
 def recommend_total_support(input_items, rules, cache, support_dict, top_n=5):
-    relevant_rules = set()
-    for item in input_items:
-        if item in cache:
-            relevant_rules |= cache[item]
-
-    recommendations = {}
-    for index in relevant_rules:
-        antecedent, consequent, support, confidence = rules[index]
-        if antecedent.issubset(input_items):
-            for item in consequent - input_items:
-                if item not in recommendations:
-                    recommendations[item] = 0
-                recommendations[item] += support
-    sorted_recommendations = sorted(recommendations.items(), key=lambda x: -x[1])
-    return [item for item, _ in sorted_recommendations[:top_n]]
+    statistics = item_statistics(input_items, rules, cache, support_dict)
+    return rank_items(statistics, "recommend_total_support", top_n)
 
 
 def recommend_weighted_confidence(input_items, rules, cache, support_dict, top_n=5):
-    relevant_rules = set()
-    for item in input_items:
-        if item in cache:
-            relevant_rules |= cache[item]
-
-    recommendations = {}
-    for index in relevant_rules:
-        antecedent, consequent, support, confidence = rules[index]
-        if antecedent.issubset(input_items):
-            weight = 1 + len(consequent.intersection(input_items))
-            for item in consequent - input_items:
-                if item not in recommendations:
-                    recommendations[item] = 0
-                recommendations[item] += weight * confidence
-    sorted_recommendations = sorted(recommendations.items(), key=lambda x: -x[1])
-    return [item for item, _ in sorted_recommendations[:top_n]]
+    statistics = item_statistics(input_items, rules, cache, support_dict)
+    return rank_items(statistics, "recommend_weighted_confidence", top_n)
 
 
 def recommend_weighted_support(input_items, rules, cache, support_dict, top_n=5):
-    relevant_rules = set()
-    for item in input_items:
-        if item in cache:
-            relevant_rules |= cache[item]
-
-    recommendations = {}
-    for index in relevant_rules:
-        antecedent, consequent, support, confidence = rules[index]
-        if antecedent.issubset(input_items):
-            weight = 1 + len(consequent.intersection(input_items))
-            for item in consequent - input_items:
-                if item not in recommendations:
-                    recommendations[item] = 0
-                recommendations[item] += weight * support
-    sorted_recommendations = sorted(recommendations.items(), key=lambda x: -x[1])
-    return [item for item, _ in sorted_recommendations[:top_n]]
+    statistics = item_statistics(input_items, rules, cache, support_dict)
+    return rank_items(statistics, "recommend_weighted_support", top_n)
 
 
 def recommend_number_rules(input_items, rules, cache, support_dict, top_n=5):
-    relevant_rules = set()
-    for item in input_items:
-        if item in cache:
-            relevant_rules |= cache[item]
-
-    recommendations = {}
-    for index in relevant_rules:
-        antecedent, consequent, support, confidence = rules[index]
-        if antecedent.issubset(input_items):
-            for item in consequent - input_items:
-                if item not in recommendations:
-                    recommendations[item] = 0
-                recommendations[item] += 1
-    sorted_recommendations = sorted(recommendations.items(), key=lambda x: -x[1])
-    return [item for item, _ in sorted_recommendations[:top_n]]
+    statistics = item_statistics(input_items, rules, cache, support_dict)
+    return rank_items(statistics, "recommend_number_rules", top_n)
 
 
 def recommend_popularity(input_items, rules, cache, support_dict, top_n=5):
+    global popular_items
+    if popular_items is None:
+        popular_items = get_popular_items(50)
     recommendations = list()
     for item in popular_items:
         if item not in input_items:
@@ -153,21 +148,8 @@ def recommend_popularity(input_items, rules, cache, support_dict, top_n=5):
 
 
 def recommend_lift(input_items, rules, cache, support_dict, top_n=5):
-    relevant_rules = set()
-    for item in input_items:
-        if item in cache:
-            relevant_rules |= cache[item]
-
-    recommendations = {}
-    for index in relevant_rules:
-        antecedent, consequent, support, confidence = rules[index]
-        if antecedent.issubset(input_items):
-            for item in consequent - input_items:
-                if item not in recommendations:
-                    recommendations[item] = 0
-                recommendations[item] += confidence / support_dict[antecedent]
-    sorted_recommendations = sorted(recommendations.items(), key=lambda x: -x[1])
-    return [item for item, _ in sorted_recommendations[:top_n]]
+    statistics = item_statistics(input_items, rules, cache, support_dict)
+    return rank_items(statistics, "recommend_lift", top_n)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,94 @@
+import time
+from collections import OrderedDict
+
+
+class BasketCache:
+    """
+    Bounded LRU cache of recommendations, keyed by the basket, the strategy and top_n.
+    The basket is canonicalized to its sorted items, so the order of the items doesn't matter.
+    Every entry belongs to a version of the rule set: the first lookup with another version empties the cache.
+    Entries expire ttl seconds after they were added, if a ttl is given.
+    """
+
+    def __init__(self, max_size=10000, ttl=None, clock=time.monotonic):
+        """
+        :param max_size: maximum number of entries, the least recently used entry is evicted first
+        :param ttl: seconds an entry stays valid, None to keep entries until they are evicted
+        :param clock: function returning the current time in seconds
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self.entries = OrderedDict()
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def key(basket, strategy, top_n):
+        return tuple(sorted(basket)), strategy, top_n
+
+    def check_version(self, version):
+        if version != self.version:
+            if self.entries:
+                self.invalidations += 1
+            self.entries.clear()
+            self.version = version
+
+    def get(self, basket, strategy, top_n, version=None):
+        """
+        :return: the cached recommendations or None
+        """
+        self.check_version(version)
+        key = self.key(basket, strategy, top_n)
+        entry = self.entries.get(key)
+        if entry is not None:
+            expiry, items = entry
+            if expiry is None or self.clock() < expiry:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return list(items)
+            del self.entries[key]
+            self.expirations += 1
+        self.misses += 1
+        return None
+
+    def put(self, basket, strategy, top_n, items, version=None):
+        self.check_version(version)
+        key = self.key(basket, strategy, top_n)
+        expiry = None if self.ttl is None else self.clock() + self.ttl
+        self.entries[key] = (expiry, tuple(items))
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def recommend(self, recommender, input_items, rules, cache, support_dict, top_n=5, *, version):
+        """
+        Calls one of the recommend_* functions of Recommendations.py through the cache.
+        :param version: version of the rule set, e.g. IncrementalRules.version. The rules object can't identify the
+                        rule set, a rule set that is patched in place stays the same object.
+        """
+        items = self.get(input_items, recommender.__name__, top_n, version)
+        if items is None:
+            items = recommender(input_items, rules, cache, support_dict, top_n)
+            self.put(input_items, recommender.__name__, top_n, items, version)
+        return items
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "size": len(self.entries),
+        }
+
+    def __len__(self):
+        return len(self.entries)
@@ -0,0 +1,208 @@
+from bisect import bisect_left
+from pathlib import Path
+
+import numpy as np
+
+from AntecedentIndex import AntecedentIndex
+from Apriori import generate_rules
+from Instrumentation import instrumentation
+from ItemDictionary import ItemsetTable
+
+# Names of the arrays a store is saved as
+ARRAYS = ("indptr", "indices", "itemset_supports", "antecedents", "consequents", "supports", "confidences")
+# Names of the arrays of the item to rule index
+INDEX_ARRAYS = ("index_items", "index_indptr", "index_rules")
+# Names of the optional arrays that describe the item codes: the item id of every code and the codes ranked on
+# popularity, for recommend_popularity
+METADATA_ARRAYS = ("items", "popular_items")
+
+
+class RuleStore:
+    """
+    Association rules of a collection of frequent itemsets, stored in columns sorted on descending confidence.
+    The rules for any higher minimum confidence are a prefix of the columns, so they are served as views
+    without generating the rules again.
+    Indexing a store gives (antecedent, consequent, support, confidence) tuples like association_rules,
+    with the antecedent and consequent as sorted tuples from the itemset table of the frequent itemsets.
+    """
+
+    def __init__(self, itemsets, antecedents, consequents, supports, confidences, base=None, index_arrays=None,
+                 items=None, popular_items=None):
+        # Antecedents and consequents are ids in the itemset table, which is shared with all views on the store
+        self.itemsets = itemsets
+        self.antecedents = antecedents
+        self.consequents = consequents
+        self.supports = supports
+        self.confidences = confidences
+        # The itemset table also maps every frequent itemset to its support
+        self.support_dict = itemsets
+        # Store this store is a view on, the rule index and rule tuples are built once by the base store and shared
+        self.base = base
+        # Rule index as saved CSR arrays (items, indptr, rules), it is only turned into a dict when it is used
+        self.index_arrays = index_arrays
+        self.rule_index = None
+        # Rules as tuples, built on first use. Indexing them is a lot faster than indexing the columns,
+        # a view only differs in its length so the rules of its cache can be looked up in the rows of the base.
+        self.rows = None
+        # Item id of every code (ItemDictionary.items) and the codes ranked on popularity, None if unknown
+        self.items = items
+        self.popular_items = popular_items
+
+    @classmethod
+    def from_itemsets(cls, frequent_itemsets, support_itemsets, min_confidence=0.01):
+        """
+        Generates the rules of the frequent itemsets once, at the lowest confidence that will be used.
+        :param frequent_itemsets: frequent itemsets
+        :param support_itemsets: supports of the frequent itemsets
+        :param min_confidence: lowest minimum confidence the store has to serve
+        :return: rule store
+        """
+        # Antecedents and consequents of rules are subsets of a frequent itemset, so they are frequent themselves
+        itemsets = ItemsetTable(frequent_itemsets, support_itemsets)
+        antecedents = []
+        consequents = []
+        supports = []
+        confidences = []
+        with instrumentation.stage("association_rules", min_confidence=min_confidence):
+            for antecedent, consequent, support, confidence in generate_rules(itemsets.itemsets, itemsets,
+                                                                              min_confidence):
+                antecedents.append(itemsets.ids[antecedent])
+                consequents.append(itemsets.ids[consequent])
+                supports.append(support)
+                confidences.append(confidence)
+        instrumentation.count("rules", len(confidences))
+
+        confidences = np.array(confidences, dtype=np.float64)
+        order = np.argsort(-confidences, kind="stable")
+        antecedents = np.array(antecedents, dtype=np.int32)[order]
+        consequents = np.array(consequents, dtype=np.int32)[order]
+        supports = np.array(supports)[order]
+        confidences = confidences[order]
+        return cls(itemsets, antecedents, consequents, supports, confidences)
+
+    def save(self, directory):
+        """
+        Saves the arrays of the store as .npy files, so they can be memory-mapped by load.
+        The items and popular items are saved along with the rules if they are known.
+        :param directory: existing directory to save the arrays in
+        """
+        directory = Path(directory)
+        for name, array in self.arrays().items():
+            np.save(directory / f"{name}.npy", array)
+        for name, array in zip(INDEX_ARRAYS, self.index_arrays or self.rule_index_arrays()):
+            np.save(directory / f"{name}.npy", array)
+        for name in METADATA_ARRAYS:
+            if getattr(self, name) is not None:
+                np.save(directory / f"{name}.npy", np.asarray(getattr(self, name)))
+
+    @classmethod
+    def load(cls, directory, mmap_mode="r"):
+        """
+        Loads a store saved by save, without copying or parsing the arrays.
+        :param directory: directory the arrays were saved in
+        :param mmap_mode: mode to memory-map the arrays with, None to read them in memory
+        :return: rule store
+        """
+        directory = Path(directory)
+        arrays = {name: np.load(directory / f"{name}.npy", mmap_mode=mmap_mode) for name in ARRAYS + INDEX_ARRAYS}
+        metadata = {name: np.load(directory / f"{name}.npy") if (directory / f"{name}.npy").exists() else None
+                    for name in METADATA_ARRAYS}
+        itemsets = ItemsetTable.from_arrays(arrays["indptr"], arrays["indices"], arrays["itemset_supports"])
+        return cls(itemsets, arrays["antecedents"], arrays["consequents"], arrays["supports"], arrays["confidences"],
+                   index_arrays=tuple(arrays[name] for name in INDEX_ARRAYS), **metadata)
+
+    def arrays(self):
+        """
+        Returns all arrays of the store, the itemset table included.
+        :return: dict mapping the names in ARRAYS to the arrays
+        """
+        return {
+            "indptr": self.itemsets.indptr,
+            "indices": self.itemsets.indices,
+            "itemset_supports": np.asarray(self.itemsets.supports),
+            "antecedents": self.antecedents,
+            "consequents": self.consequents,
+            "supports": self.supports,
+            "confidences": self.confidences,
+        }
+
+    def __len__(self):
+        return len(self.confidences)
+
+    def __getitem__(self, index):
+        if not 0 <= index < len(self):
+            raise IndexError("rule index out of range")
+        if self.base is not None:
+            return self.base[index]
+        if self.rows is None:
+            itemsets = self.itemsets.itemsets
+            self.rows = [(itemsets[antecedent], itemsets[consequent], support, confidence) for
+                         antecedent, consequent, support, confidence in
+                         zip(self.antecedents.tolist(), self.consequents.tolist(), self.supports.tolist(),
+                             self.confidences.tolist())]
+        return self.rows[index]
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def threshold(self, min_confidence):
+        """
+        Returns a view on the rules with confidence >= min_confidence.
+        :param min_confidence: minimum confidence, at least the confidence the store was built with
+        :return: rule store sharing its columns with this store
+        """
+        end = np.searchsorted(-self.confidences, -min_confidence, side="right")
+        base = self.base if self.base is not None else self
+        return RuleStore(self.itemsets, self.antecedents[:end], self.consequents[:end], self.supports[:end],
+                         self.confidences[:end], base)
+
+    def rules_index(self):
+        """
+        Maps every item to the sorted indices of the rules that contain it in their antecedent, like rules_cache.
+        The index is built once and shared with all views, which only keep the indices below their length.
+        """
+        if self.base is not None:
+            return self.base.rules_index()
+        if self.rule_index is None:
+            items, indptr, rules = self.index_arrays or self.rule_index_arrays()
+            rules = rules.tolist()
+            bounds = indptr.tolist()
+            self.rule_index = {item: rules[start:end] for item, start, end in zip(items.tolist(), bounds, bounds[1:])}
+        return self.rule_index
+
+    def rule_index_arrays(self):
+        """
+        Builds the rule index as CSR arrays from the CSR arrays of the itemset table.
+        :return: items, start of the rules of every item and the end of the last one, rule indices
+        """
+        # Gather the items of every antecedent
+        lengths = np.diff(self.itemsets.indptr)[self.antecedents]
+        starts = np.repeat(self.itemsets.indptr[self.antecedents] - np.cumsum(lengths) + lengths, lengths)
+        items = self.itemsets.indices[starts + np.arange(lengths.sum())]
+        indices = np.repeat(np.arange(len(self.antecedents)), lengths)
+        order = np.argsort(items, kind="stable")
+        items = items[order]
+        indices = indices[order]
+        unique_items, starts = np.unique(items, return_index=True)
+        indptr = np.append(starts, len(items)).astype(np.int64)
+        return unique_items.astype(np.int32), indptr, indices.astype(np.int32)
+
+    def antecedent_index(self):
+        """
+        Returns a prefix tree over the antecedents of the rules in this store, it can be used instead of the cache.
+        :return: AntecedentIndex
+        """
+        return AntecedentIndex(self)
+
+    def rules_cache(self):
+        """
+        Returns the item to rule indices cache of the rules in this store.
+        :return: dict mapping every item to a list with the indices of the rules that contain it in their antecedent
+        """
+        cache = dict()
+        for item, indices in self.rules_index().items():
+            end = bisect_left(indices, len(self))
+            if end:
+                cache[item] = indices[:end]
+        return cache
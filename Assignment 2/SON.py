@@ -0,0 +1,116 @@
+import os
+import pathlib
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from Apriori import apriori, count_support
+from TransactionDatabase import TransactionDatabase
+
+# Database of a worker process, set once by init_worker so it isn't pickled with every task
+worker_state = dict()
+
+
+def init_worker(path):
+    """
+    Memory-maps the database in the worker, so the workers share its pages instead of receiving a pickled copy.
+    :param path: transaction file or directory of a saved database
+    """
+    path = pathlib.Path(path)
+    worker_state["database"] = TransactionDatabase.load(path) if path.is_dir() else TransactionDatabase.open(path)
+
+
+def mine_partition(start, end, min_count):
+    """
+    Mines the locally frequent itemsets of a partition of the database.
+    :param start: index of the first transaction of the partition
+    :param end: index after the last transaction of the partition
+    :param min_count: minimum absolute support in the partition
+    :return: locally frequent itemsets as sorted tuples
+    """
+    partition = worker_state["database"][start:end]
+    # Halfway between two counts, so rounding can't move a count to the other side of the threshold
+    frequent_itemsets, _ = apriori(partition, (min_count - 0.5) / len(partition))
+    return [tuple(sorted(itemset)) for itemset in frequent_itemsets]
+
+
+def count_partition(start, end, candidates):
+    """
+    Counts the support of the candidates in a partition of the database.
+    :return: absolute support of every candidate
+    """
+    return count_support(worker_state["database"][start:end], candidates)
+
+
+def son(transactions, min_support, n_partitions=None, max_workers=None):
+    """
+    Mines the frequent itemsets with the SON algorithm on a pool of processes.
+    The database is split in partitions of which the locally frequent itemsets are mined in parallel.
+    A frequent itemset is frequent in at least one partition, so the union of the locally frequent itemsets
+    holds all frequent itemsets. Their global support is counted in a second parallel pass.
+    :param transactions: list of transactions, a TransactionDatabase or the filename of a transaction file
+    :param min_support: minimum relative support of a frequent itemset
+    :param n_partitions: number of partitions, max_workers by default
+    :param max_workers: number of worker processes, all cores by default
+    :return: frequent itemsets and frequent itemsets by length, the same as apriori
+    """
+    if isinstance(transactions, (str, pathlib.Path)):
+        # Converted once here, the workers load the converted arrays
+        database = TransactionDatabase.open(transactions)
+        path = transactions
+    elif isinstance(transactions, TransactionDatabase):
+        database = transactions
+        path = None
+    else:
+        database = TransactionDatabase.from_transactions(transactions)
+        path = None
+    n_transactions = len(database)
+    if n_transactions == 0:
+        return dict(), [dict()]
+
+    # Smallest absolute support that passes the test of apriori, an itemset with this support in the whole database
+    # has at least a proportional share of it in one of the partitions
+    min_count = max(int(min_support * n_transactions), 0)
+    while min_count > 0 and (min_count - 1) / n_transactions >= min_support:
+        min_count -= 1
+    while min_count / n_transactions < min_support:
+        min_count += 1
+
+    max_workers = max_workers or os.cpu_count() or 1
+    n_partitions = min(n_partitions or max_workers, n_transactions)
+    bounds = [n_transactions * partition // n_partitions for partition in range(n_partitions + 1)]
+    partitions = list(zip(bounds, bounds[1:]))
+
+    # A database in memory is saved for the workers, in /dev/shm it never touches the disk
+    temporary = None
+    if path is None:
+        shm = pathlib.Path("/dev/shm")
+        temporary = tempfile.mkdtemp(prefix="son_", dir=shm if shm.is_dir() else None)
+        database.save(temporary)
+        path = temporary
+    try:
+        with ProcessPoolExecutor(max_workers, initializer=init_worker, initargs=(path,)) as pool:
+            # The local threshold is rounded up, a local count below it can't add up to min_count over all partitions
+            local = pool.map(mine_partition, *zip(*[(start, end, -(-min_count * (end - start) // n_transactions))
+                                                    for start, end in partitions]))
+            candidates = sorted(set().union(*local))
+            counts = np.zeros(len(candidates), dtype=np.int64)
+            for partition_counts in pool.map(count_partition, *zip(*[(start, end, candidates)
+                                                                     for start, end in partitions])):
+                counts += partition_counts
+    finally:
+        if temporary is not None:
+            shutil.rmtree(temporary, ignore_errors=True)
+
+    itemsets_by_length = [dict()]
+    for candidate, support in zip(candidates, counts.tolist()):
+        if support / n_transactions >= min_support:
+            while len(itemsets_by_length) <= len(candidate):
+                itemsets_by_length.append(dict())
+            itemsets_by_length[len(candidate)][frozenset(candidate)] = support / n_transactions
+    frequent_itemsets = dict()
+    for itemsets in itemsets_by_length:
+        frequent_itemsets.update(itemsets)
+    return frequent_itemsets, itemsets_by_length
@@ -0,0 +1,265 @@
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+from BatchRecommendations import BatchRecommender
+from ItemDictionary import ItemDictionary
+from Recommendations import STRATEGIES
+from ResultCache import BasketCache
+from RuleStore import RuleStore
+
+STATUS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 500: "Internal Server Error"}
+
+
+class Model:
+    """
+    Everything the server needs to answer a request with one rule set, it is replaced as a whole on a swap.
+    """
+
+    def __init__(self, rules, dictionary=None, popular_items=None, version=0):
+        """
+        :param rules: RuleStore of which the itemsets are encoded as item codes
+        :param dictionary: ItemDictionary of the codes, the baskets and recommendations are item codes without one
+        :param popular_items: items ranked on popularity, for recommend_popularity
+        :param version: version of the rule set, returned with every recommendation
+        """
+        self.dictionary = dictionary
+        if dictionary is not None and popular_items is not None:
+            popular_items = [dictionary.codes[item] for item in popular_items if item in dictionary.codes]
+        self.recommender = BatchRecommender(rules, popular_items)
+        self.n_rules = len(rules)
+        self.version = version
+
+    @classmethod
+    def load(cls, directory, popular_items=None, version=0):
+        """
+        Loads a rule set saved by RuleStore.save with the item ids of its codes, see GridExecutor.
+        The baskets of the requests are item ids, so a rule set without the items of its codes can't be served.
+        :param popular_items: items ranked on popularity, only used if the rule set wasn't saved with its own
+        """
+        directory = Path(directory)
+        if not (directory / "items.npy").exists():
+            raise ValueError(f"{directory} has no items.npy, save the rule set with the ItemDictionary of its codes")
+        rules = RuleStore.load(directory)
+        dictionary = ItemDictionary(rules.items.tolist())
+        if rules.popular_items is not None:
+            popular_items = [dictionary.items[code] for code in rules.popular_items.tolist()]
+        return cls(rules, dictionary, popular_items, version)
+
+    def encode(self, basket):
+        if self.dictionary is None:
+            return set(basket)
+        return set(self.dictionary.encode(basket))
+
+    def decode(self, codes):
+        if self.dictionary is None:
+            return codes
+        return [self.dictionary.items[code] for code in codes]
+
+    def recommend(self, requests):
+        """
+        Recommends items for a batch of requests at once.
+        :param requests: list of (basket, strategy, top_n) tuples
+        :return: list with the recommended items of every request
+        """
+        baskets = [self.encode(basket) for basket, _, _ in requests]
+        strategies = list(dict.fromkeys(strategy for _, strategy, _ in requests))
+        top_ns = list(dict.fromkeys(top_n for _, _, top_n in requests))
+        recommendations = self.recommender.recommend_all(baskets, strategies, top_ns)
+        return [self.decode(recommendations[strategy, top_n][index])
+                for index, (_, strategy, top_n) in enumerate(requests)]
+
+
+class RecommendationServer:
+    """
+    HTTP/JSON server for the recommenders of Recommendations.py, on asyncio without external dependencies.
+
+    POST /recommend  {"basket": [items], "strategy": "recommend_lift", "top_n": 5} -> {"items": [...], "version": v}
+    POST /reload     {"directory": rule set saved by RuleStore.save} -> {"version": v, "rules": n}
+    GET  /health     -> {"version": v, "rules": n, "cache": statistics of the result cache}
+
+    Concurrent requests are collected for at most batch_window seconds and answered with one batch recommendation.
+    A reload builds the new model next to the current one and swaps it in with a single assignment: batches that
+    already started finish with the old model, every later batch uses the new one.
+    Recommendations are cached per version of the model, so repeated baskets skip the batch altogether.
+    """
+
+    def __init__(self, model, batch_window=0.002, max_batch=256, cache=None):
+        """
+        :param model: Model to serve
+        :param batch_window: seconds a request waits for other requests to be batched with
+        :param max_batch: maximum number of requests in a batch
+        :param cache: BasketCache for the recommendations, a cache of 10000 baskets by default
+        """
+        self.model = model
+        self.cache = cache if cache is not None else BasketCache()
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.queue = None
+        self.server = None
+        self.batcher = None
+
+    async def start(self, host="127.0.0.1", port=8080):
+        self.queue = asyncio.Queue()
+        self.batcher = asyncio.create_task(self.batch_requests())
+        self.server = await asyncio.start_server(self.handle_connection, host, port)
+        return self.server
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+        self.batcher.cancel()
+
+    async def recommend(self, basket, strategy, top_n):
+        """
+        Queues a request for the next batch.
+        :return: recommended items and the version of the rule set that made them
+        """
+        model = self.model
+        items = self.cache.get(basket, strategy, top_n, model.version)
+        if items is not None:
+            return items, model.version
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put(((basket, strategy, top_n), future))
+        return await future
+
+    async def batch_requests(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.batch_window
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            # The model of the batch is fixed here, a swap during the batch doesn't affect it
+            model = self.model
+            requests = [request for request, _ in batch]
+            try:
+                # The sparse products run in a thread, so the loop keeps accepting requests
+                recommendations = await loop.run_in_executor(None, model.recommend, requests)
+            except Exception as error:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(error)
+                continue
+            for ((basket, strategy, top_n), future), items in zip(batch, recommendations):
+                # A result of an old model is still returned, but the cache only keeps the current version
+                if model is self.model:
+                    self.cache.put(basket, strategy, top_n, items, model.version)
+                if not future.done():
+                    future.set_result((items, model.version))
+
+    async def reload(self, directory):
+        """
+        Loads a new rule set and swaps it in.
+        :return: the new model
+        """
+        current = self.model
+        popular_items = current.decode(current.recommender.popular_items)
+        model = await asyncio.get_running_loop().run_in_executor(
+            None, Model.load, directory, popular_items, current.version + 1)
+        self.model = model
+        return model
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                except ValueError as error:
+                    write_response(writer, 400, {"error": f"Malformed request: {error}"}, keep_alive=False)
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+                method, path, headers, body = request
+                status, response = await self.route(method, path, body)
+                keep_alive = headers.get("connection", "").lower() != "close"
+                write_response(writer, status, response, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def route(self, method, path, body):
+        """
+        :return: HTTP status and JSON serializable response
+        """
+        try:
+            if path == "/health":
+                return 200, {"version": self.model.version, "rules": self.model.n_rules, "cache": self.cache.stats()}
+            if path not in ("/recommend", "/reload"):
+                return 404, {"error": f"Unknown path {path}"}
+            if method != "POST":
+                return 405, {"error": "Use POST"}
+            data = json.loads(body or b"{}")
+            if not isinstance(data, dict):
+                return 400, {"error": "The body must be a JSON object"}
+            if path == "/reload":
+                model = await self.reload(data["directory"])
+                return 200, {"version": model.version, "rules": model.n_rules}
+
+            strategy = data.get("strategy", "recommend_lift")
+            if strategy not in STRATEGIES and strategy != "recommend_popularity":
+                return 400, {"error": f"Unknown strategy {strategy}"}
+            top_n = data.get("top_n", 5)
+            if not isinstance(top_n, int) or isinstance(top_n, bool) or top_n <= 0:
+                return 400, {"error": f"top_n must be a positive integer, not {top_n!r}"}
+            basket = [int(item) for item in data["basket"]]
+            items, version = await self.recommend(basket, strategy, top_n)
+            return 200, {"items": items, "version": version}
+        except (KeyError, TypeError, ValueError) as error:
+            return 400, {"error": f"Invalid request: {error!r}"}
+        except Exception as error:
+            return 500, {"error": repr(error)}
+
+
+async def read_request(reader):
+    """
+    Reads an HTTP/1.1 request.
+    :return: method, path, headers with lowercase names and body, or None if the connection was closed
+    :raises ValueError: if the request line or the Content-Length is malformed
+    """
+    line = await reader.readline()
+    if not line:
+        return None
+    method, path, _ = line.decode("latin-1").split(" ", 2)
+    headers = dict()
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get("content-length", 0))
+    body = await reader.readexactly(length) if length else b""
+    return method, path, headers, body
+
+
+def write_response(writer, status, response, keep_alive=True):
+    body = json.dumps(response).encode()
+    writer.write(f"HTTP/1.1 {status} {STATUS[status]}\r\n"
+                 f"Content-Type: application/json\r\n"
+                 f"Content-Length: {len(body)}\r\n"
+                 f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + body)
+
+
+async def serve(directory, host="127.0.0.1", port=8080):
+    server = RecommendationServer(Model.load(directory))
+    await server.start(host, port)
+    print(f"Serving {server.model.n_rules} rules on http://{host}:{port}")
+    await server.server.serve_forever()
+
+
+if __name__ == "__main__":
+    # Usage: python Server.py <rule set directory> [port]
+    asyncio.run(serve(sys.argv[1], port=int(sys.argv[2]) if len(sys.argv) > 2 else 8080))
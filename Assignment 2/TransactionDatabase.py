@@ -0,0 +1,208 @@
+from collections import Counter
+from itertools import chain
+from pathlib import Path
+
+import numpy as np
+from numpy.lib.format import open_memmap
+from sklearn.model_selection import train_test_split
+
+
+def scan_lines(filename):
+    """
+    Iterates over the transactions in a file, with the items in the order of the file and without duplicates.
+    :param filename: transaction file
+    :return: generator of lists of items
+    """
+    with open(filename) as f:
+        for line in f:
+            yield list(dict.fromkeys(map(int, line.split())))
+
+
+def count_items(transactions):
+    """
+    Counts the occurrences of every item, in the order in which the items first occur like Counter.
+    :param transactions: list of transactions, a TransactionDatabase or a TransactionStream
+    :return: Counter
+    """
+    if isinstance(transactions, TransactionDatabase):
+        return transactions.item_counts()
+    if hasattr(transactions, "chunks"):
+        # A stream is counted a chunk at a time, so only one chunk is in memory
+        counts = Counter()
+        for chunk in transactions.chunks():
+            counts.update(chunk.item_counts())
+        return counts
+    return Counter(chain(*transactions))
+
+
+class TransactionDatabase:
+    """
+    Transactions stored as CSR arrays: the items of transaction t are indices[indptr[t]:indptr[t + 1]].
+    A database is saved as .npy files and memory-mapped when it is loaded, so loading it doesn't create
+    any Python objects and the pages of the arrays are shared with other processes.
+    Indexing or iterating a database gives the transactions as sets, like read_transactions.
+    """
+
+    # Number of transactions of which the items are converted to Python ints at once when iterating
+    chunk_size = 4096
+
+    def __init__(self, indptr, indices):
+        self.indptr = indptr
+        self.indices = indices
+
+    @classmethod
+    def from_transactions(cls, transactions):
+        """
+        :param transactions: list of transactions
+        :return: database in memory
+        """
+        lengths = np.fromiter(map(len, transactions), dtype=np.int64, count=len(transactions))
+        indptr = np.zeros(len(transactions) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=indptr[1:])
+        indices = np.fromiter(chain.from_iterable(transactions), dtype=np.int32, count=indptr[-1])
+        return cls(indptr, indices)
+
+    @classmethod
+    def convert(cls, filename, directory):
+        """
+        Converts a transaction file to a database, without reading the whole file in memory.
+        :param filename: transaction file, one transaction of space separated items per line
+        :param directory: directory to save the arrays in
+        :return: the memory-mapped database
+        """
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        # The first scan sizes the arrays, the second fills them
+        n_transactions = 0
+        n_items = 0
+        for transaction in scan_lines(filename):
+            n_transactions += 1
+            n_items += len(transaction)
+
+        indptr = open_memmap(directory / "indptr.npy", mode="w+", dtype=np.int64, shape=(n_transactions + 1,))
+        indices = open_memmap(directory / "indices.npy", mode="w+", dtype=np.int32, shape=(n_items,))
+        indptr[0] = 0
+        position = 0
+        for tid, transaction in enumerate(scan_lines(filename)):
+            indices[position:position + len(transaction)] = transaction
+            position += len(transaction)
+            indptr[tid + 1] = position
+        indptr.flush()
+        indices.flush()
+        del indptr, indices
+        return cls.load(directory)
+
+    @classmethod
+    def open(cls, filename):
+        """
+        Loads the database of a transaction file, the file is converted the first time and when it has changed.
+        :param filename: transaction file
+        :return: the memory-mapped database
+        """
+        filename = Path(filename)
+        directory = filename.with_suffix(".db")
+        arrays = [directory / "indptr.npy", directory / "indices.npy"]
+        if all(array.exists() and array.stat().st_mtime >= filename.stat().st_mtime for array in arrays):
+            return cls.load(directory)
+        return cls.convert(filename, directory)
+
+    @classmethod
+    def load(cls, directory, mmap_mode="r"):
+        """
+        :param directory: directory the arrays were saved in
+        :param mmap_mode: mode to memory-map the arrays with, None to read them in memory
+        :return: database
+        """
+        directory = Path(directory)
+        return cls(np.load(directory / "indptr.npy", mmap_mode=mmap_mode),
+                   np.load(directory / "indices.npy", mmap_mode=mmap_mode))
+
+    def save(self, directory):
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        np.save(directory / "indptr.npy", self.indptr)
+        np.save(directory / "indices.npy", self.indices)
+
+    def __len__(self):
+        return len(self.indptr) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, (slice, list, np.ndarray)):
+            return self.take(np.arange(len(self))[index])
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("transaction index out of range")
+        return set(self.indices[self.indptr[index]:self.indptr[index + 1]].tolist())
+
+    def __iter__(self):
+        # Converting the items of many transactions at once is a lot faster than one transaction at a time
+        for start in range(0, len(self), self.chunk_size):
+            bounds = self.indptr[start:start + self.chunk_size + 1]
+            items = self.indices[bounds[0]:bounds[-1]].tolist()
+            bounds = (bounds - bounds[0]).tolist()
+            for begin, end in zip(bounds, bounds[1:]):
+                yield set(items[begin:end])
+
+    def transaction_ids(self):
+        """
+        Returns the transaction id of every entry of indices.
+        """
+        return np.repeat(np.arange(len(self), dtype=np.int64), np.diff(self.indptr))
+
+    def item_counts(self):
+        """
+        Counts the occurrences of every item, in the order in which the items first occur.
+        :return: Counter
+        """
+        items, first, counts = np.unique(self.indices, return_index=True, return_counts=True)
+        order = np.argsort(first)
+        return Counter(dict(zip(items[order].tolist(), counts[order].tolist())))
+
+    def popular_items(self, top_n=10):
+        """
+        Returns the most frequent items, ties are ordered on their first occurrence like get_popular_items.
+        :param top_n: number of items
+        :return: list of items
+        """
+        items, first, counts = np.unique(self.indices, return_index=True, return_counts=True)
+        order = np.lexsort((first, -counts))
+        return items[order[:top_n]].tolist()
+
+    def take(self, rows):
+        """
+        Returns the database of some of the transactions.
+        :param rows: transaction ids, in the order of the new database
+        :return: database in memory
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        lengths = np.diff(self.indptr)[rows]
+        indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=indptr[1:])
+        starts = np.repeat(self.indptr[rows] - indptr[:-1], lengths)
+        return TransactionDatabase(indptr, self.indices[starts + np.arange(indptr[-1])])
+
+    def split(self, test_size=0.15, random_state=None):
+        """
+        Splits the transactions in a train and test database, like train_test_split on a list of transactions.
+        :param test_size: fraction of the transactions in the test database
+        :param random_state: seed of the shuffle
+        :return: train and test database
+        """
+        train, test = train_test_split(np.arange(len(self)), test_size=test_size, random_state=random_state)
+        return self.take(train), self.take(test)
+
+    def encode(self, dictionary):
+        """
+        Encodes the items with an ItemDictionary, items that are not in the dictionary are left out.
+        :param dictionary: ItemDictionary
+        :return: database of item codes, in memory
+        """
+        size = max(max(dictionary.codes, default=0), int(self.indices.max(initial=0))) + 1
+        lookup = np.full(size, -1, dtype=np.int64)
+        lookup[list(dictionary.codes)] = list(dictionary.codes.values())
+        codes = lookup[self.indices]
+        known = codes >= 0
+        indptr = np.zeros(len(self) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.transaction_ids()[known], minlength=len(self)), out=indptr[1:])
+        return TransactionDatabase(indptr, codes[known].astype(np.int32))
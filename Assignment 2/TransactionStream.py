@@ -0,0 +1,42 @@
+from itertools import islice
+
+from TransactionDatabase import TransactionDatabase
+
+
+class TransactionStream:
+    """
+    Transactions of a file that is read again for every pass, a chunk of transactions at a time.
+    Only one chunk is in memory at once, so the memory doesn't grow with the size of the file.
+    Iterating a stream gives the transactions as sets, like read_transactions.
+    """
+
+    def __init__(self, filename, chunk_size=65536):
+        """
+        :param filename: transaction file, one transaction of space separated items per line
+        :param chunk_size: number of transactions in a chunk
+        """
+        self.filename = filename
+        self.chunk_size = chunk_size
+        self.n_transactions = None
+
+    def chunks(self):
+        """
+        Reads the file once.
+        :return: generator of TransactionDatabases with the transactions of every chunk
+        """
+        with open(self.filename) as f:
+            while True:
+                lines = list(islice(f, self.chunk_size))
+                if not lines:
+                    break
+                yield TransactionDatabase.from_transactions([set(map(int, line.split())) for line in lines])
+
+    def __iter__(self):
+        for chunk in self.chunks():
+            yield from chunk
+
+    def __len__(self):
+        if self.n_transactions is None:
+            with open(self.filename, "rb") as f:
+                self.n_transactions = sum(1 for _ in f)
+        return self.n_transactions
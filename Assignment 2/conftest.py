@@ -0,0 +1,82 @@
+from itertools import combinations
+
+import numpy as np
+import pytest
+
+
+def brute_force(transactions, min_support):
+    """
+    Mines the frequent itemsets by counting every subset of every transaction, the oracle of the miners.
+    :return: dict mapping the frequent itemsets as frozensets to their relative support
+    """
+    counts = dict()
+    for transaction in transactions:
+        items = sorted(transaction)
+        for length in range(1, len(items) + 1):
+            for itemset in combinations(items, length):
+                counts[itemset] = counts.get(itemset, 0) + 1
+    return {frozenset(itemset): count / len(transactions) for itemset, count in counts.items()
+            if count / len(transactions) >= min_support}
+
+
+def brute_force_statistics(basket, rules, support_dict):
+    """
+    Statistics of every item that a rule recommends for the basket, from a scan over all rules, the oracle of the
+    recommenders.
+    :return: dict mapping every recommendable item to a dict with its statistics
+    """
+    statistics = dict()
+    for antecedent, consequent, support, confidence in rules:
+        if not set(antecedent) <= basket:
+            continue
+        weight = 1 + len(basket.intersection(consequent))
+        for item in set(consequent) - basket:
+            statistic = statistics.setdefault(item, dict.fromkeys(
+                ["number_rules", "total_confidence", "total_support", "weighted_confidence", "weighted_support",
+                 "lift"], 0))
+            statistic["number_rules"] += 1
+            statistic["total_confidence"] += confidence
+            statistic["total_support"] += support
+            statistic["weighted_confidence"] += weight * confidence
+            statistic["weighted_support"] += weight * support
+            statistic["lift"] += confidence / support_dict[antecedent]
+    for statistic in statistics.values():
+        statistic["average_confidence"] = statistic["total_confidence"] / statistic["number_rules"]
+        statistic["average_support"] = statistic["total_support"] / statistic["number_rules"]
+    return statistics
+
+
+def generate_transactions(n_transactions, n_items=30, n_patterns=20, seed=1):
+    """
+    Generates short transactions from a few overlapping patterns plus noise, so there are frequent itemsets of
+    several lengths while brute force stays fast.
+    :return: list of transactions as sets of items, like read_transactions
+    """
+    rng = np.random.default_rng(seed)
+    patterns = [rng.choice(n_items, rng.integers(2, 5), replace=False).tolist() for _ in range(n_patterns)]
+    weights = rng.exponential(1, n_patterns)
+    weights /= weights.sum()
+    transactions = []
+    for _ in range(n_transactions):
+        transaction = set()
+        for index in rng.choice(n_patterns, rng.integers(1, 3), p=weights):
+            # Every item of a pattern is dropped with a chance of 1/4
+            transaction.update(item for item in patterns[index] if rng.random() >= 0.25)
+        transaction.update(rng.choice(n_items, rng.integers(0, 3)).tolist())
+        transactions.append(transaction or {int(rng.integers(n_items))})
+    return transactions
+
+
+@pytest.fixture(scope="session")
+def transactions():
+    return generate_transactions(300)
+
+
+@pytest.fixture(scope="session")
+def mine():
+    return brute_force
+
+
+@pytest.fixture(scope="session")
+def score():
+    return brute_force_statistics
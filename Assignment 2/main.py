@@ -1,17 +1,26 @@
 import subprocess
+import time
 from pathlib import Path
 
 import numpy as np
-from sklearn.model_selection import train_test_split
 from tqdm import tqdm
 
-from Apriori import association_rules
-from ParameterGrid import ParameterGrid
+import Recommendations
+from Cache import ArtifactCache, fingerprint
+from GridExecutor import GridExecutor
+from Instrumentation import instrumentation
+from ItemDictionary import ItemDictionary
+from NDI import non_derivable_itemsets
+from ParameterGrid import ParameterGrid, Checkpoint
 from Recommendations import recommend_average_confidence, recommend_average_support, recommend_total_confidence, \
     recommend_total_support, recommend_weighted_confidence, recommend_weighted_support, recommend_number_rules, \
     recommend_popularity, recommend_lift
-from utils import read_transactions, write_transactions, read_frequent_itemsets, evaluate_recommendations, \
-    split_transactions, rules_cache, plot
+from TransactionDatabase import TransactionDatabase, count_items
+from utils import write_transactions, read_frequent_itemsets, evaluate_cutoffs, \
+    split_transactions, plot, sort_by_support, get_popular_items
+
+# Opt-in timers, counters and profiles of the stages, e.g. INSTRUMENTATION="memory,association_rules=cprofile"
+instrumentation.configure_from_environment()
 
 data_dir = Path("data")
 if not data_dir.exists():
@@ -25,16 +34,21 @@ train_data = data_dir / "train.dat"
 test_data = data_dir / "test.dat"
 
 if not train_data.exists() or not test_data.exists():
-    transactions = read_transactions(data_dir / "retail.dat")
-    train, test = train_test_split(transactions, test_size=0.15)
+    train, test = TransactionDatabase.open(data_dir / "retail.dat").split(test_size=0.15)
 
     write_transactions(data_dir / "train.dat", train)
     write_transactions(data_dir / "test.dat", test)
-else:
-    train = read_transactions(train_data)
-    test = read_transactions(test_data)
 
-test = split_transactions(test)
+# The transactions are memory-mapped from their binary databases, the text files are only parsed once
+train = TransactionDatabase.open(train_data)
+test = TransactionDatabase.open(test_data)
+
+# Encode the items as dense codes, the mining, rules and recommendations all work on the codes
+dictionary = ItemDictionary.from_counts(count_items(train) + count_items(test))
+train = train.encode(dictionary)
+test = split_transactions(test.encode(dictionary))
+Recommendations.popular_items = [dictionary.codes[item] for item in get_popular_items(50, data_dir / "retail.dat")]
+instrumentation.snapshot("data")
 
 # min_support = [5, 10, 15, 20, 25, 50, 75, 100, 150, 200, 250, 300, 350, 400, 450, 500]
 # min_support = [15, 20, 25, 50, 75, 100]
@@ -56,72 +70,94 @@ recommendations = [
     recommend_lift,
 ]
 
-# Generate ndi and apriori results for each min_support
-for support in min_support:
-    file = data_dir / "ndi" / f"min_support_{support}.dat"
-    if not file.exists():
-        subprocess.run([lib_dir / "ndi" / "bf" / "ndi", data_dir / "train.dat", str(support), "100", str(file)],
-                       check=True)
-    file = data_dir / "apriori" / f"min_support_{support}.dat"
+# Mine the itemsets once at the lowest min_support
+# The itemsets of every higher min_support are a prefix of the itemsets sorted on support
+lowest_support = min(min_support)
+# The codes of the items depend on the train and test data, the cached itemsets and rules are keyed on both
+cache = ArtifactCache(data_dir / "cache")
+data = fingerprint(train_data, test_data)
+
+
+def mine_apriori():
+    file = data_dir / "apriori" / f"min_support_{lowest_support}.dat"
     if not file.exists():
-        subprocess.run([lib_dir / "apriori" / "apriori", data_dir / "train.dat", "3", str(support), str(file)],
-                       check=True)
+        with instrumentation.stage("apriori_subprocess", min_support=lowest_support):
+            subprocess.run([lib_dir / "apriori" / "apriori", train_data, "3", str(lowest_support), str(file)],
+                           check=True)
+    return read_frequent_itemsets(file, dictionary=dictionary)
+
+
+def mine_ndi():
+    with instrumentation.stage("ndi", min_support=lowest_support):
+        return non_derivable_itemsets(train, lowest_support)
 
+
+mined_itemsets = {
+    True: sort_by_support(*cache.itemsets(cache.key(data, "ndi", min_support=lowest_support),
+                                          mine_ndi,
+                                          miner="ndi", min_support=lowest_support)),
+    False: sort_by_support(*cache.itemsets(cache.key(data, "apriori", min_support=lowest_support), mine_apriori,
+                                           miner="apriori", min_support=lowest_support)),
+}
+instrumentation.snapshot("mined_itemsets")
+
+# min_confidence changes fastest, the rule set of (min_support, ndi) is generated once for all its confidences
 param_grid = ParameterGrid({
-    'min_support': min_support,
-    'ndi': [True, False],
-    'top_n': top_n,
     'min_confidence': min_confidence,
-    'recommender': recommendations,
-})
-
-previous_support = None
-previous_ndi = None
-previous_confidence = None
-frequent_itemsets = None
-support_itemsets = None
-rules = None
-cache = None
-support_dict = None
-results = dict()
-# Run gridsearch for each parameter combination
-for params in tqdm(param_grid):
-    # print(params)
-    ndi = params['ndi']
-    support = params['min_support']
-    confidence = params['min_confidence']
-    top_n = params['top_n']
-    if support != previous_support or ndi != previous_ndi:
-        file = data_dir / ("ndi" if ndi else "apriori") / f"min_support_{support}.dat"
-        frequent_itemsets, support_itemsets = read_frequent_itemsets(file, ndi=ndi)
-
-    if support != previous_support or confidence != previous_confidence or ndi != previous_ndi:
-        rules, support_dict = association_rules(frequent_itemsets, support_itemsets, confidence)
-        cache = rules_cache(rules)
-
-    recommender = params['recommender']
-    recommender_lambda = lambda x: recommender(x, rules, cache, support_dict, top_n)
-
-    key = (top_n, ndi, recommender.__name__)
-    support_index = min_support.index(support)
-    confidence_index = min_confidence.index(confidence)
-    if key not in results:
-        results[key] = np.zeros((len(min_support), len(min_confidence), 3))
-    results[key][support_index, confidence_index, :] = evaluate_recommendations(test, recommender_lambda, top_n)
-
-    previous_support = support
-    previous_ndi = ndi
-    previous_confidence = confidence
-
-for metric in ["precision", "recall", "f1_score"]:
+    'ndi': [True, False],
+    'min_support': min_support,
+}, costs={'min_confidence': 0, 'ndi': 1, 'min_support': 2})
+names = [recommender.__name__ for recommender in recommendations]
+# Completed combinations are recorded, so an interrupted gridsearch resumes where it stopped
+# Results of other data, mined itemsets, cutoffs or recommenders are not reused
+checkpoint = Checkpoint(data_dir / "gridsearch.jsonl", param_grid, fingerprint(data, lowest_support, top_n, names))
+
+metrics = ["precision", "recall", "f1_score", "map", "ndcg"]
+results = {(n, ndi, name): np.zeros((len(min_support), len(min_confidence), len(metrics)))
+           for n in top_n for ndi in [True, False] for name in names}
+
+
+# Keys of the results with at least one completed combination, the others are never plotted
+filled = set()
+
+
+def store_result(params, n, name, result):
+    support_index = min_support.index(params['min_support'])
+    confidence_index = min_confidence.index(params['min_confidence'])
+    results[n, params['ndi'], name][support_index, confidence_index, :] = result
+    filled.add((n, params['ndi'], name))
+
+
+for index, result in checkpoint.done.items():
+    for n, name, *values in result:
+        store_result(param_grid[index], n, name, values)
+
+# The recommendations of the whole test set are made at once, only the baskets are needed for that
+baskets = [input_items for input_items, _ in test]
+# Every recommender ranks once at the largest top_n, the recommendations for a smaller top_n are a prefix of it
+with GridExecutor(baskets, Recommendations.popular_items, names, [max(top_n)], cache=cache, data=data,
+                  dictionary=dictionary) as executor:
+    pending = (params for _, params in checkpoint.pending())
+    # Run gridsearch for each parameter combination, every rule set gives the recommendations of all recommenders
+    # and the metrics of all top_n values at once
+    for params, recommended in tqdm(executor.run(mined_itemsets, pending), total=len(param_grid) - len(checkpoint)):
+        # print(params)
+        result = []
+        with instrumentation.stage("evaluate", **params):
+            for name in names:
+                for n, values in zip(top_n, evaluate_cutoffs(test, recommended[name, max(top_n)], top_n).tolist()):
+                    store_result(params, n, name, values)
+                    result.append([n, name, *values])
+        checkpoint.add(param_grid.index(params), result)
+checkpoint.remove()
+instrumentation.snapshot("gridsearch")
+
+if instrumentation.enabled:
+    print(instrumentation.report())
+    instrumentation.export(f"results/profiling/main_{time.strftime('%Y%m%d_%H%M%S')}.json")
+
+for index, metric in enumerate(metrics):
     for key, result in results.items():
-        if metric == "precision":
-            index = 0
-        elif metric == "recall":
-            index = 1
-        elif metric == "f1_score":
-            index = 2
-        else:
-            raise ValueError("Invalid metric")
-
+        if key not in filled:
+            continue
         plot(metric, key, min_confidence, min_support, result[:, :, index], save=True)
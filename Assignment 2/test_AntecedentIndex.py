@@ -0,0 +1,33 @@
+from AntecedentIndex import AntecedentIndex
+
+
+def fired(rules, basket):
+    return sorted(index for index, rule in enumerate(rules) if rule is not None and set(rule[0]) <= basket)
+
+
+def test_fired_matches_scan(transactions):
+    # Rules with the transactions as antecedents, a removed rule and an empty antecedent that always fires
+    rules = [(tuple(sorted(transaction))[:3], (), 0, 0) for transaction in transactions[:200]]
+    rules[5] = None
+    rules.append(((), (), 0, 0))
+    index = AntecedentIndex(rules)
+    assert len(index) == len(rules) - 1
+    for basket in map(set, transactions):
+        assert sorted(index.fired(basket)) == fired(rules, basket)
+
+
+def test_add_and_discard():
+    index = AntecedentIndex()
+    index.add((1, 2), 0)
+    index.add((2, 1, 3), 1)
+    index.add((4,), 2)
+    assert sorted(index.fired({1, 2, 3})) == [0, 1]
+    index.discard((1, 2), 0)
+    index.discard((1, 2), 7)
+    index.discard((5, 6), 0)
+    assert index.fired({1, 2, 3}) == [1]
+    assert len(index) == 2
+    index.discard((1, 2, 3), 1)
+    # Nodes that no longer lead to a rule are removed
+    assert list(index.root[0]) == [4]
+    assert index.fired({1, 2, 3, 4}) == [2]
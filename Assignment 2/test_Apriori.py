@@ -0,0 +1,84 @@
+from itertools import combinations
+
+import pytest
+
+from Apriori import apriori, association_rules, bitmaps_support, join_set, popcount, transaction_bitmaps
+from FPGrowth import fp_growth
+
+
+def test_bitmaps_support_matches_scan(transactions):
+    itemsets = [frozenset(itemset) for itemset in [(0,), (1, 2), (0, 3, 5), (999,), (1, 999)]]
+    expected = [sum(itemset <= transaction for transaction in transactions) for itemset in itemsets]
+    # Bitmaps of all items, more than 64 transactions so the bitsets span several words
+    assert bitmaps_support(transaction_bitmaps(transactions), itemsets).tolist() == expected
+
+
+def test_transaction_bitmaps_bits():
+    transactions = [{1}, set(), {1, 2}] + [{2}] * 70
+    index, bitmaps = transaction_bitmaps(transactions)
+    assert bitmaps.shape == (3, 2)
+    assert bitmaps[index[1]].tolist() == [0b101, 0]
+    assert popcount(bitmaps[index[2]]) == 71
+    # The row of the items that don't occur stays empty
+    assert not bitmaps[-1].any()
+
+
+@pytest.mark.parametrize("min_support", [0.01, 0.05, 0.2])
+def test_apriori_matches_brute_force(transactions, mine, min_support):
+    expected = mine(transactions, min_support)
+    frequent_itemsets, itemsets_by_length = apriori(transactions, min_support)
+    assert frequent_itemsets.keys() == expected.keys()
+    assert all(frequent_itemsets[itemset] == pytest.approx(support) for itemset, support in expected.items())
+    assert all(len(itemset) == length for length, itemsets in enumerate(itemsets_by_length) for itemset in itemsets)
+
+
+@pytest.mark.parametrize("min_support", [0.01, 0.05, 0.2])
+def test_fp_growth_matches_apriori(transactions, min_support, tmp_path):
+    expected, expected_by_length = apriori(transactions, min_support)
+    # A transaction file is scanned twice without reading it in memory
+    filename = tmp_path / "transactions.dat"
+    filename.write_text("".join(" ".join(map(str, sorted(transaction))) + "\n" for transaction in transactions))
+    results = [fp_growth(transactions, min_support), fp_growth(filename, min_support),
+               apriori(transactions, min_support, backend="fpgrowth")]
+    for frequent_itemsets, itemsets_by_length in results:
+        assert frequent_itemsets == pytest.approx(expected)
+        assert len(itemsets_by_length) == len(expected_by_length)
+        assert all(itemsets == pytest.approx(expected_itemsets)
+                   for itemsets, expected_itemsets in zip(itemsets_by_length, expected_by_length))
+
+
+def test_join_set_matches_brute_force(transactions, mine):
+    frequent = mine(transactions, 0.02)
+    items = sorted(set().union(*frequent))
+    for k in range(2, max(map(len, frequent)) + 2):
+        level = [itemset for itemset in frequent if len(itemset) == k - 1]
+        # Every k-itemset of which all (k-1)-subsets are frequent, one of them is extended with a larger item
+        extended = {tuple(sorted(itemset)) + (item,) for itemset in level for item in items if item > max(itemset)}
+        expected = {candidate for candidate in extended
+                    if all(frozenset(subset) in frequent for subset in combinations(candidate, k - 1))}
+        candidates = join_set(level, k)
+        assert len(candidates) == len(set(candidates))
+        assert set(candidates) == expected
+
+
+@pytest.mark.parametrize("min_confidence", [0, 0.3, 0.8])
+def test_association_rules_match_brute_force(transactions, mine, min_confidence):
+    frequent = mine(transactions, 0.03)
+    rules, support_dict = association_rules(list(frequent), list(frequent.values()), min_confidence)
+    # Every split of every frequent itemset in a non-empty antecedent and consequent
+    expected = dict()
+    for itemset, support in frequent.items():
+        for length in range(1, len(itemset)):
+            for antecedent in map(frozenset, combinations(itemset, length)):
+                if support / frequent[antecedent] >= min_confidence:
+                    expected[antecedent, itemset - antecedent] = support / frequent[antecedent]
+    assert len(rules) == len(expected)
+    assert {(antecedent, consequent): confidence for antecedent, consequent, _, confidence in rules} == \
+        pytest.approx(expected)
+    assert all(support == frequent[antecedent | consequent] for antecedent, consequent, support, _ in rules)
+    assert support_dict == frequent
+
+
+def test_miners_without_transactions():
+    assert fp_growth([], 0.1) == (dict(), [dict()])
+    assert apriori([], 0.1, backend="fpgrowth") == (dict(), [dict()])
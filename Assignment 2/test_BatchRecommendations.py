@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from BatchRecommendations import CHUNK_ENTRIES, STRATEGIES, BatchRecommender, itemset_matrix
+from ItemDictionary import ItemDictionary
+from RuleStore import RuleStore
+
+
+@pytest.fixture(scope="module")
+def encoded(transactions):
+    return ItemDictionary.from_transactions(transactions).encode_transactions(transactions)
+
+
+@pytest.fixture(scope="module")
+def store(encoded, mine):
+    frequent = mine(encoded, 0.03)
+    return RuleStore.from_itemsets(list(frequent), list(frequent.values()), 0.2)
+
+
+@pytest.mark.parametrize("strategy", sorted(STRATEGIES))
+def test_batch_matches_brute_force(encoded, store, score, strategy):
+    view = store.threshold(0.4)
+    baskets = encoded[:60]
+    # A small chunk size, so the baskets are scored in several chunks
+    recommendations = BatchRecommender(view, chunk_size=7).recommend(baskets, strategy, 3)
+    primary, _ = STRATEGIES[strategy]
+    for basket, recommended in zip(baskets, recommendations):
+        statistics = score(basket, view, view.support_dict)
+        # Ties can be ranked in another order, the recommended items have to have the best primary statistics
+        ranking = sorted((statistic[primary] for statistic in statistics.values()), reverse=True)
+        assert len(set(recommended)) == len(recommended)
+        assert [statistics[item][primary] for item in recommended] == pytest.approx(ranking[:3])
+
+
+def test_popularity_skips_basket_items():
+    recommender = BatchRecommender(RuleStore.from_itemsets([(0,), (1,), (0, 1)], [5, 4, 3]), popular_items=[2, 0, 3, 1])
+    assert recommender.recommend([{0}, {1, 2}, set()], "recommend_popularity", 2) == [[2, 3], [0, 3], [2, 0]]
+
+
+def test_recommend_all_matches_recommend(encoded, store):
+    recommender = BatchRecommender(store.threshold(0.3), popular_items=[0, 1, 2, 3, 4, 5, 6, 7], chunk_size=7)
+    strategies = sorted(STRATEGIES) + ["recommend_popularity"]
+    recommendations = recommender.recommend_all(encoded[:60], strategies, [1, 3])
+    assert recommendations.keys() == {(strategy, top_n) for strategy in strategies for top_n in [1, 3]}
+    for (strategy, top_n), items in recommendations.items():
+        assert items == recommender.recommend(encoded[:60], strategy, top_n)
+
+
+def test_consequent_overlap_matches_product(encoded, store):
+    recommender = BatchRecommender(store.threshold(0.3))
+    baskets = itemset_matrix(encoded[:60], recommender.n_items)
+    fired = recommender.fired_rules(baskets)
+    overlap = (baskets @ recommender.consequents.T).toarray()
+    rows = np.repeat(np.arange(fired.shape[0]), np.diff(fired.indptr))
+    assert recommender.consequent_overlap(fired, baskets).tolist() == overlap[rows, fired.indices].tolist()
+
+
+def test_default_chunk_size(store):
+    recommender = BatchRecommender(store)
+    assert recommender.chunk_size == CHUNK_ENTRIES // max(recommender.n_items, len(store))
+    assert BatchRecommender(store, chunk_size=7).chunk_size == 7
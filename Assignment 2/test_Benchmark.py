@@ -0,0 +1,51 @@
+import copy
+
+from Benchmark import compare, generate_transactions, run
+from Instrumentation import instrumentation
+from TransactionDatabase import TransactionDatabase
+
+
+def test_generator_is_reproducible():
+    transactions = generate_transactions(500, n_items=100, seed=3)
+    assert transactions == generate_transactions(500, n_items=100, seed=3)
+    assert transactions != generate_transactions(500, n_items=100, seed=4)
+    assert all(transaction and all(0 <= item < 100 for item in transaction) for transaction in transactions)
+
+
+def test_report_counts_match_mining(mine):
+    grid = {"min_confidence": [0.2], "min_support": [0.1], "n_transactions": [200]}
+    report = run(grid, memory=False, n_items=30, avg_length=4)
+    (result,) = report["results"]
+    assert result["params"] == {"min_confidence": 0.2, "min_support": 0.1, "n_transactions": 200}
+    apriori = result["stages"]["apriori"]
+
+    # The benchmark mines the train part of the split
+    train, _ = TransactionDatabase.from_transactions(generate_transactions(200, n_items=30, avg_length=4)).split(
+        test_size=0.15, random_state=0)
+    frequent = mine(list(train), 0.1)
+    lengths = [sum(len(itemset) == length for itemset in frequent) for length in range(1, len(apriori["frequent"]) + 1)]
+    assert apriori["frequent"] == lengths
+    assert sum(lengths) == len(frequent)
+    assert all(candidates >= frequent for candidates, frequent in zip(apriori["candidates"], apriori["frequent"]))
+    # Apriori only counts the frequent items at the first level, and the benchmark leaves the instrumentation off
+    assert apriori["candidates"][0] == apriori["frequent"][0]
+    assert not instrumentation.enabled
+    assert compare(report, report) == []
+
+
+def test_compare_reports_regressions():
+    baseline = {"results": [{"params": {"min_support": 0.1},
+                             "stages": {"apriori": {"time": 1.0, "peak_memory": 1000, "frequent": [5, 2]},
+                                        "rules_cache": {"time": 0.001}}}]}
+    report = copy.deepcopy(baseline)
+    stages = report["results"][0]["stages"]
+    stages["apriori"]["time"] = 1.2
+    # Times below min_time are too noisy to compare
+    stages["rules_cache"]["time"] = 0.005
+    assert compare(report, baseline, tolerance=0.25) == []
+
+    stages["apriori"]["peak_memory"] = 1300
+    stages["apriori"]["frequent"] = [5, 3]
+    regressions = compare(report, baseline, tolerance=0.25)
+    assert len(regressions) == 2
+    assert "peak_memory" in regressions[0] and "frequent" in regressions[1]
@@ -0,0 +1,94 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from Cache import ArtifactCache, fingerprint
+from RuleStore import RuleStore
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ArtifactCache(tmp_path / "cache")
+
+
+def mine():
+    return [(1,), (2,), (3,), (1, 2), (1, 3), (2, 3), (1, 2, 3)], [6, 5, 4, 4, 3, 3, 2]
+
+
+def test_fingerprint_depends_on_the_contents(tmp_path):
+    path = tmp_path / "train.dat"
+    path.write_text("1 2\n3\n")
+    before = fingerprint(path, 0.1)
+    assert fingerprint(path, 0.1) == before
+    path.write_text("1 2\n4\n")
+    assert fingerprint(path, 0.1) != before
+    # Moving a value from one source to another changes the hash
+    assert fingerprint("ab", "c") != fingerprint("a", "bc")
+    assert fingerprint(np.arange(3, dtype=np.int32)) != fingerprint(np.arange(3, dtype=np.int64))
+
+
+def test_itemsets_are_mined_once(cache):
+    calls = []
+    key = cache.key("data", "ndi", min_support=2)
+    for _ in range(2):
+        itemsets, supports = cache.itemsets(key, lambda: calls.append(1) or mine())
+        assert list(itemsets) == mine()[0]
+        assert supports.tolist() == mine()[1]
+    assert len(calls) == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cache.key("data", "ndi", min_support=3) != key
+
+
+def test_stale_entries_are_removed(cache):
+    key = cache.key("data", "ndi")
+    path = cache.put(key, lambda directory: np.save(directory / "supports.npy", np.arange(3)))
+    assert cache.get(key, ["supports"]) == path
+    assert cache.get(key, ["supports", "indptr"]) is None
+    assert not path.exists()
+
+    path = cache.put(key, lambda directory: np.save(directory / "supports.npy", np.arange(3)))
+    with open(path / "meta.json", "w") as f:
+        json.dump({"version": -1}, f)
+    assert cache.get(key, ["supports"]) is None
+    assert not path.exists()
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ArtifactCache(tmp_path, max_bytes=0)
+    paths = [cache.put(str(key), lambda directory: np.save(directory / "a.npy", np.zeros(100))) for key in range(3)]
+    # The entry that was just written is always kept
+    assert [path.exists() for path in paths] == [False, False, True]
+
+    # Room for two entries, their metadata can differ a few bytes in size
+    cache.max_bytes = 2 * sum(file.stat().st_size for file in paths[2].iterdir()) + 100
+    cache.put("3", lambda directory: np.save(directory / "a.npy", np.zeros(100)))
+    os.utime(paths[2] / "meta.json", (0, 0))
+    cache.get("3", ["a"])
+    cache.put("4", lambda directory: np.save(directory / "a.npy", np.zeros(100)))
+    assert sorted(path.name for _, _, path in cache.entries()) == ["3", "4"]
+
+
+def test_rules_round_trip(cache):
+    store = RuleStore.from_itemsets(*mine(), 0.1)
+    key = cache.key("data", "rules", min_confidence=0.1)
+    path = cache.rules(key, lambda: store)
+    assert cache.rules(key, lambda: pytest.fail("generated twice")) == path
+    loaded = RuleStore.load(path)
+    assert list(loaded) == list(store)
+    assert loaded.rules_cache() == store.rules_cache()
+
+
+def test_pinned_entries_are_not_evicted(tmp_path):
+    cache = ArtifactCache(tmp_path, max_bytes=0)
+    cache.put("0", lambda directory: np.save(directory / "a.npy", np.zeros(100)))
+    cache.pin("0")
+    cache.pin("0")
+    cache.put("1", lambda directory: np.save(directory / "a.npy", np.zeros(100)))
+    cache.unpin("0")
+    cache.put("2", lambda directory: np.save(directory / "a.npy", np.zeros(100)))
+    assert sorted(path.name for _, _, path in cache.entries()) == ["0", "2"]
+    cache.unpin("0")
+    cache.put("3", lambda directory: np.save(directory / "a.npy", np.zeros(100)))
+    assert [path.name for _, _, path in cache.entries()] == ["3"]
@@ -0,0 +1,60 @@
+import pytest
+
+from BatchRecommendations import STRATEGIES, BatchRecommender
+from Cache import ArtifactCache
+from GridExecutor import GridExecutor
+from ItemDictionary import ItemDictionary
+from ParameterGrid import ParameterGrid
+from RuleStore import RuleStore
+from utils import sort_by_support, support_threshold
+
+STRATEGY_NAMES = sorted(STRATEGIES) + ["recommend_popularity"]
+POPULAR_ITEMS = list(range(10))
+GRID = ParameterGrid({'min_confidence': [0.2, 0.5], 'ndi': [True, False], 'min_support': [6, 15]})
+
+
+@pytest.fixture(scope="module")
+def encoded(transactions):
+    return ItemDictionary.from_transactions(transactions).encode_transactions(transactions)
+
+
+@pytest.fixture(scope="module")
+def mined_itemsets(encoded, mine):
+    frequent = mine(encoded, 0.02)
+    counts = [round(support * len(encoded)) for support in frequent.values()]
+    return {ndi: sort_by_support(list(frequent), counts) for ndi in (True, False)}
+
+
+def run(encoded, mined_itemsets, **options):
+    with GridExecutor(encoded[:50], POPULAR_ITEMS, STRATEGY_NAMES, [1, 3], max_workers=2, shards=3,
+                      **options) as executor:
+        return list(executor.run(mined_itemsets, GRID))
+
+
+def check(results, encoded, mined_itemsets):
+    assert [params for params, _ in results] == list(GRID)
+    for params, recommendations in results:
+        frequent_itemsets, support_itemsets = support_threshold(*mined_itemsets[params['ndi']],
+                                                                params['min_support'])
+        view = RuleStore.from_itemsets(frequent_itemsets, support_itemsets, 0.2).threshold(params['min_confidence'])
+        expected = BatchRecommender(view, POPULAR_ITEMS).recommend_all(encoded[:50], STRATEGY_NAMES, [1, 3])
+        assert recommendations == expected
+
+
+def test_grid_matches_batch_recommender(encoded, mined_itemsets):
+    check(run(encoded, mined_itemsets), encoded, mined_itemsets)
+
+
+def test_grid_reuses_cached_rule_sets(encoded, mined_itemsets, tmp_path):
+    cache = ArtifactCache(tmp_path)
+    check(run(encoded, mined_itemsets, cache=cache, data="data"), encoded, mined_itemsets)
+    assert (cache.hits, cache.misses) == (0, 4)
+    check(run(encoded, mined_itemsets, cache=cache, data="data"), encoded, mined_itemsets)
+    assert (cache.hits, cache.misses) == (4, 4)
+
+
+def test_pinned_rule_sets_outlive_eviction(encoded, mined_itemsets, tmp_path):
+    # Every new rule set evicts the others, except the ones the workers still need
+    cache = ArtifactCache(tmp_path, max_bytes=0)
+    check(run(encoded, mined_itemsets, cache=cache, data="data"), encoded, mined_itemsets)
+    assert not cache.pinned
@@ -0,0 +1,73 @@
+import pytest
+
+from Apriori import association_rules
+from Incremental import IncrementalMiner, IncrementalRules
+from TransactionDatabase import TransactionDatabase
+
+
+def batches(transactions):
+    # A first part and growing batches, the last one with an item that didn't occur before
+    return [transactions[:100], transactions[100:150], transactions[150:300], [[0, 1000], [1000]] * 5]
+
+
+@pytest.mark.parametrize("min_support", [0.02, 0.05])
+def test_miner_matches_brute_force_after_every_update(transactions, mine, min_support):
+    first, *updates = batches(transactions)
+    miner = IncrementalMiner(TransactionDatabase.from_transactions(first), min_support)
+    seen = list(first)
+    for batch in updates:
+        old = {frozenset(itemset) for itemset in miner.frequent}
+        added, removed, _ = miner.update(batch)
+        seen += batch
+        expected = mine(seen, min_support)
+        assert {frozenset(itemset) for itemset in miner.frequent} == expected.keys()
+        assert all(miner.counts[tuple(sorted(itemset))] == round(support * len(seen))
+                   for itemset, support in expected.items())
+        assert {frozenset(itemset) for itemset in added} == expected.keys() - old
+        assert {frozenset(itemset) for itemset in removed} == old - expected.keys()
+
+
+def test_rules_match_association_rules_after_every_update(transactions, mine):
+    first, *updates = batches(transactions)
+    rules = IncrementalRules(IncrementalMiner(first, 0.05), 0.3)
+    seen = list(first)
+    for batch in updates:
+        version = rules.version
+        rules.update(batch)
+        assert rules.version > version
+        seen += batch
+        frequent = mine(seen, 0.05)
+        expected, _ = association_rules(list(frequent), list(frequent.values()), 0.3)
+        patched = [rule for rule in rules.rules if rule is not None]
+        assert {(frozenset(antecedent), frozenset(consequent)) for antecedent, consequent, _, _ in patched} == \
+            {(antecedent, consequent) for antecedent, consequent, _, _ in expected}
+        # The cache refers to every rule of which the antecedent holds the item, and to nothing else
+        cache = dict()
+        for index, rule in enumerate(rules.rules):
+            for item in rule[0] if rule is not None else ():
+                cache.setdefault(item, set()).add(index)
+        assert rules.cache == cache
+        # The index finds the same fired rules as the cache
+        for basket in map(set, seen[:30]):
+            fired = {index for index, rule in enumerate(rules.rules) if rule is not None and set(rule[0]) <= basket}
+            assert sorted(rules.index.fired(basket)) == sorted(fired)
+
+    rules.compact()
+    assert None not in rules.rules
+    assert len(rules.index) == len(rules.rules)
+    assert rules.cache == {item: {index for index, rule in enumerate(rules.rules) if item in rule[0]}
+                           for item in rules.cache}
+
+
+def test_update_only_patches_the_touched_itemsets(monkeypatch):
+    # Item 2 becomes infrequent by the growth of the database alone, (1, 4) shares item 1 with the removed (1, 2)
+    # but neither its support nor the supports of its subsets change
+    rules = IncrementalRules(IncrementalMiner([[1, 2]] * 2 + [[1, 4]] * 4 + [[3]] * 2, 0.25), 0.1)
+    kept = {index: rules.rules[index] for index in rules.itemset_rules[(1, 4)].values()}
+    patched = []
+    patch_itemset = rules.patch_itemset
+    monkeypatch.setattr(rules, "patch_itemset", lambda itemset: patched.append(itemset) or patch_itemset(itemset))
+    rules.update([[3]] * 2)
+    assert sorted(patched) == [(1, 2), (2,), (3,)]
+    assert all(rules.rules[index] is rule for index, rule in kept.items())
+    assert {rule[:2] for rule in rules.rules if rule is not None} == {((1,), (4,)), ((4,), (1,))}
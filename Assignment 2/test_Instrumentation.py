@@ -0,0 +1,99 @@
+import json
+import tracemalloc
+
+import pytest
+
+from Apriori import apriori, association_rules, join_set
+from Instrumentation import instrumentation
+
+
+@pytest.fixture
+def instrumented():
+    instrumentation.configure()
+    yield instrumentation
+    instrumentation.configure(enabled=False)
+
+
+def test_disabled_measures_nothing():
+    assert not instrumentation.enabled
+    with instrumentation.stage("apriori"):
+        instrumentation.count("rules", 3)
+    assert instrumentation.timers == dict() and instrumentation.counters == dict()
+
+
+def test_stages_and_counters(instrumented, transactions, mine):
+    for _ in range(2):
+        frequent_itemsets, itemsets_by_length = apriori(transactions, 0.05)
+    rules, _ = association_rules(list(frequent_itemsets), list(frequent_itemsets.values()), 0.3)
+    assert instrumented.timers["apriori"][0] == 2
+    assert instrumented.counters["rules"][1] == len(rules)
+    # Every level counts the candidates joined from the frequent itemsets of the level before
+    for k in range(2, len(itemsets_by_length)):
+        observations, total, maximum = instrumented.counters[f"candidates_level_{k}"]
+        assert (observations, total) == (2, 2 * maximum)
+        assert maximum == len(join_set(list(itemsets_by_length[k - 1]), k))
+    assert instrumented.timers["association_rules"][0] == 1
+
+
+def test_fpgrowth_is_measured_like_apriori(instrumented, transactions):
+    frequent_itemsets, itemsets_by_length = apriori(transactions, 0.05, backend="fpgrowth")
+    assert instrumented.timers["fpgrowth"][0] == 1
+    assert "apriori" not in instrumented.timers
+    assert instrumented.counters["conditional_patterns"][0] > 0
+    # Both backends count the frequent itemsets of every level
+    fpgrowth_counters = {name: counter for name, counter in instrumented.counters.items()
+                         if name.startswith("itemsets_level_")}
+    assert {name: total for name, (_, total, _) in fpgrowth_counters.items()} == \
+        {f"itemsets_level_{k}": len(itemsets_by_length[k]) for k in range(1, len(itemsets_by_length))}
+    instrumented.configure()
+    apriori(transactions, 0.05)
+    assert {name: counter for name, counter in instrumented.counters.items()
+            if name.startswith("itemsets_level_") and counter[1] > 0} == fpgrowth_counters
+
+
+def test_snapshots(transactions):
+    # Without tracing the memory, or disabled, a snapshot records nothing
+    instrumentation.snapshot("data")
+    instrumentation.configure()
+    try:
+        instrumentation.snapshot("data")
+        assert instrumentation.snapshots == []
+        instrumentation.configure(memory=True)
+        instrumentation.snapshot("data")
+        frequent_itemsets, _ = apriori(transactions, 0.05)
+        instrumentation.snapshot("apriori")
+        snapshots, events = instrumentation.snapshots, instrumentation.events
+    finally:
+        instrumentation.configure(enabled=False)
+    assert [snapshot["name"] for snapshot in snapshots] == ["data", "apriori"]
+    assert all(snapshot["peak"] >= snapshot["memory"] > 0 for snapshot in snapshots)
+    assert "memory" in [event["name"] for event in events]
+    assert not tracemalloc.is_tracing()
+
+
+def test_environment_options(monkeypatch):
+    monkeypatch.setenv("INSTRUMENTATION", "sampling,association_rules=cprofile,interval=0.01")
+    try:
+        instrumentation.configure_from_environment()
+        assert instrumentation.enabled
+        assert (instrumentation.mode, instrumentation.modes) == ("sampling", {"association_rules": "cprofile"})
+        assert instrumentation.interval == 0.01
+    finally:
+        instrumentation.configure(enabled=False)
+    with pytest.raises(ValueError):
+        instrumentation.configure(mode="unknown")
+
+
+def test_export_trace_and_profiles(transactions, tmp_path):
+    instrumentation.configure(modes={"apriori": "cprofile"})
+    try:
+        frequent_itemsets, _ = apriori(transactions, 0.05)
+        association_rules(list(frequent_itemsets), list(frequent_itemsets.values()), 0.3)
+        instrumentation.export(tmp_path / "run.json")
+    finally:
+        instrumentation.configure(enabled=False)
+    with open(tmp_path / "run.json") as f:
+        trace = json.load(f)
+    assert [event["name"] for event in trace["traceEvents"]] == ["apriori", "association_rules"]
+    assert trace["otherData"]["timers"]["apriori"][0] == 1
+    assert (tmp_path / "run.apriori.prof").exists()
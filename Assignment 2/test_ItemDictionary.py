@@ -0,0 +1,26 @@
+from ItemDictionary import ItemDictionary, ItemsetTable
+
+
+def test_codes_follow_frequency(transactions):
+    dictionary = ItemDictionary.from_transactions(transactions)
+    counts = [sum(item in transaction for transaction in transactions) for item in dictionary.items]
+    assert counts == sorted(counts, reverse=True)
+    assert len(dictionary) == len(set().union(*transactions))
+
+    encoded = dictionary.encode_transactions(transactions)
+    assert [dictionary.decode(codes) for codes in encoded] == list(map(frozenset, transactions))
+    # Unknown items are left out
+    assert dictionary.encode({dictionary.items[3], -1, dictionary.items[0]}) == (0, 3)
+
+
+def test_itemset_table(transactions, mine):
+    frequent = mine(transactions, 0.05)
+    table = ItemsetTable(list(frequent), list(frequent.values()))
+    assert len(table) == len(frequent)
+    for itemset, support in frequent.items():
+        assert itemset in table
+        assert table[itemset] == table[tuple(sorted(itemset))] == support
+        # The CSR arrays hold the items of every itemset
+        identifier = table.id(itemset)
+        assert table.indices[table.indptr[identifier]:table.indptr[identifier + 1]].tolist() == sorted(itemset)
+    assert frozenset({-1}) not in table
@@ -0,0 +1,44 @@
+from itertools import combinations
+
+import pytest
+
+from NDI import non_derivable_itemsets
+
+
+def bounds(itemset, counts):
+    """
+    Lower and upper bound of the deduction rules on the support of an itemset, straight from their definition.
+    :param counts: absolute support of every strict subset of the itemset, the empty set included
+    """
+    lower, upper = 0, counts[frozenset()]
+    items = sorted(itemset)
+    for length in range(len(items)):
+        for subset in map(frozenset, combinations(items, length)):
+            bound = sum((-1) ** (len(itemset - between) + 1) * counts[between]
+                        for between_length in range(length, len(items))
+                        for between in map(frozenset, combinations(items, between_length)) if subset <= between)
+            if len(itemset - subset) % 2:
+                upper = min(upper, bound)
+            else:
+                lower = max(lower, bound)
+    return lower, upper
+
+
+@pytest.mark.parametrize("min_support", [2, 3, 10])
+def test_non_derivable_itemsets_match_brute_force(transactions, mine, min_support):
+    counts = {itemset: round(support * len(transactions)) for itemset, support in mine(transactions, 0).items()}
+    counts[frozenset()] = len(transactions)
+    expected = dict()
+    for itemset, count in counts.items():
+        if itemset and count >= min_support:
+            lower, upper = bounds(itemset, counts)
+            if lower < upper:
+                expected[itemset] = count
+    frequent_itemsets, support_itemsets = non_derivable_itemsets(transactions, min_support)
+    assert dict(zip(frequent_itemsets, support_itemsets)) == expected
+    assert len(frequent_itemsets) == len(expected)
+
+
+def test_max_size(transactions):
+    frequent_itemsets, _ = non_derivable_itemsets(transactions, 3, max_size=2)
+    assert max(map(len, frequent_itemsets)) == 2
@@ -0,0 +1,81 @@
+from itertools import product
+
+import pytest
+
+from ParameterGrid import Checkpoint, ParameterGrid
+
+GRID = {'min_confidence': [0.1, 0.2, 0.3], 'ndi': [True, False], 'min_support': [2, 4, 8, 16]}
+
+
+def test_first_parameter_changes_fastest():
+    grid = ParameterGrid(GRID)
+    expected = [dict(min_confidence=confidence, ndi=ndi, min_support=support)
+                for support, ndi, confidence in product(*reversed(GRID.values()))]
+    assert list(grid) == expected
+    assert all(list(params) == list(GRID) for params in grid)
+
+
+def test_random_access():
+    grid = ParameterGrid(GRID, costs={'min_support': 3, 'ndi': 2})
+    combinations = list(grid)
+    assert len(grid) == len(combinations) == 24
+    assert all(grid[index] == params and grid.index(params) == index for index, params in enumerate(combinations))
+    assert grid[-1] == combinations[-1]
+    assert grid[3:20:4] == combinations[3:20:4]
+    with pytest.raises(IndexError):
+        grid[24]
+
+
+def test_costs_order_the_expensive_parameters_slowest():
+    grid = ParameterGrid({'min_support': [2, 4], 'ndi': [True, False], 'min_confidence': [0.1, 0.2, 0.3]},
+                         costs={'min_support': 3, 'ndi': 2})
+    combinations = list(grid)
+    assert [params['min_confidence'] for params in combinations[:3]] == [0.1, 0.2, 0.3]
+    assert [params['min_support'] for params in combinations] == [2] * 6 + [4] * 6
+
+
+def test_shards_cover_the_grid():
+    grid = ParameterGrid(GRID, costs={'min_support': 3, 'ndi': 2})
+    shards = [grid.shard(k, 5) for k in range(5)]
+    assert sum(shards, []) == list(grid)
+    assert max(map(len, shards)) - min(map(len, shards)) <= 1
+    with pytest.raises(ValueError):
+        grid.shard(5, 5)
+
+
+def test_checkpoint_resumes(tmp_path):
+    grid = ParameterGrid({'top_n': [1, 2, 3], 'recommender': [len, sorted]})
+    path = tmp_path / "checkpoint.jsonl"
+    checkpoint = Checkpoint(path, grid)
+    for index, params in list(checkpoint.pending())[:4]:
+        checkpoint.add(index, [params['top_n'], 0.5])
+    # A line cut off by a crash
+    with open(path, "a") as f:
+        f.write('{"index": 4, "par')
+
+    resumed = Checkpoint(path, grid)
+    assert len(resumed) == 4
+    assert resumed[2] == [3, 0.5]
+    assert [index for index, _ in resumed.pending()] == [4, 5]
+
+    # Entries of combinations that are no longer in the grid are ignored
+    changed = Checkpoint(path, ParameterGrid({'top_n': [1, 5, 3], 'recommender': [len, sorted]}))
+    assert sorted(changed.done) == [0, 2, 3]
+    resumed.remove()
+    assert not path.exists()
+
+
+def test_checkpoint_ignores_other_fingerprints(tmp_path):
+    grid = ParameterGrid({'top_n': [1, 2, 3]})
+    path = tmp_path / "checkpoint.jsonl"
+    checkpoint = Checkpoint(path, grid, fingerprint="train-a")
+    checkpoint.add(0, 0.1)
+    checkpoint.add(1, 0.2)
+    assert len(Checkpoint(path, grid, fingerprint="train-a")) == 2
+    # Results of other data are never reused, also not by a checkpoint without a fingerprint
+    other = Checkpoint(path, grid, fingerprint="train-b")
+    assert len(other) == 0
+    other.add(0, 0.3)
+    assert Checkpoint(path, grid, fingerprint="train-b")[0] == 0.3
+    assert Checkpoint(path, grid, fingerprint="train-a")[0] == 0.1
+    assert len(Checkpoint(path, grid)) == 0
@@ -0,0 +1,64 @@
+import pytest
+
+import Recommendations
+from Apriori import association_rules
+from ItemDictionary import ItemDictionary
+from Recommendations import STATISTICS, STRATEGIES, item_statistics, recommend_all
+from RuleStore import RuleStore
+from utils import rules_cache
+
+
+@pytest.fixture(scope="module")
+def encoded(transactions):
+    return ItemDictionary.from_transactions(transactions).encode_transactions(transactions)
+
+
+@pytest.fixture(scope="module")
+def frequent(encoded, mine):
+    return mine(encoded, 0.03)
+
+
+@pytest.fixture(scope="module", params=["list", "store", "index"])
+def rules(request, frequent):
+    """
+    Rules with confidence >= 0.3 with their cache and support dict, as a list like association_rules and as a view
+    on a RuleStore, with a rules_cache or an AntecedentIndex
+    """
+    if request.param == "list":
+        rules, support_dict = association_rules(list(frequent), list(frequent.values()), 0.3)
+        return rules, rules_cache(rules), support_dict
+    view = RuleStore.from_itemsets(list(frequent), list(frequent.values()), 0.1).threshold(0.3)
+    if request.param == "index":
+        return view, view.antecedent_index(), view.support_dict
+    return view, view.rules_cache(), view.support_dict
+
+
+def test_item_statistics_match_brute_force(encoded, rules, score):
+    for basket in encoded[:40]:
+        expected = score(basket, rules[0], rules[2])
+        statistics = item_statistics(basket, *rules)
+        assert statistics.keys() == expected.keys()
+        for item, values in statistics.items():
+            assert values == pytest.approx([expected[item][name] for name in STATISTICS])
+
+
+@pytest.mark.parametrize("strategy", sorted(STRATEGIES))
+def test_recommenders_rank_on_their_statistics(encoded, rules, score, strategy):
+    recommender = getattr(Recommendations, strategy)
+    primary, _ = STRATEGIES[strategy]
+    for basket in encoded[:40]:
+        statistics = score(basket, rules[0], rules[2])
+        # Ties can be ranked in another order, the recommended items have to have the best primary statistics
+        ranking = sorted((statistic[primary] for statistic in statistics.values()), reverse=True)
+        recommended = recommender(basket, *rules, 4)
+        assert [statistics[item][primary] for item in recommended] == pytest.approx(ranking[:4])
+
+
+def test_recommend_all_matches_every_recommender(encoded, rules, monkeypatch):
+    monkeypatch.setattr(Recommendations, "popular_items", [0, 1, 2, 3, 4, 5, 6, 7])
+    for basket in encoded[:40]:
+        recommendations = recommend_all(basket, *rules, 3)
+        assert recommendations.keys() == set(STRATEGIES) | {"recommend_popularity"}
+        for strategy, items in recommendations.items():
+            assert items == getattr(Recommendations, strategy)(basket, *rules, 3)
+        assert recommendations["recommend_popularity"] == [item for item in range(8) if item not in basket][:3]
@@ -0,0 +1,77 @@
+import pytest
+
+import Recommendations
+from Apriori import association_rules
+from Incremental import IncrementalMiner, IncrementalRules
+from ResultCache import BasketCache
+
+
+class Clock:
+    def __init__(self):
+        self.time = 0
+
+    def __call__(self):
+        return self.time
+
+
+def test_lru_eviction():
+    cache = BasketCache(max_size=2)
+    cache.put({1, 2}, "recommend_lift", 5, [3, 4], version=0)
+    cache.put({3}, "recommend_lift", 5, [1], version=0)
+    # The order of the items of a basket doesn't matter
+    assert cache.get([2, 1], "recommend_lift", 5, version=0) == [3, 4]
+    assert cache.get({1, 2}, "recommend_lift", 3, version=0) is None
+    cache.put({4}, "recommend_lift", 5, [2], version=0)
+    assert cache.get({3}, "recommend_lift", 5, version=0) is None
+    assert cache.get({1, 2}, "recommend_lift", 5, version=0) == [3, 4]
+    assert cache.get({4}, "recommend_lift", 5, version=0) == [2]
+    assert cache.stats() == {"hits": 3, "misses": 2, "hit_rate": 3 / 5, "evictions": 1, "expirations": 0,
+                             "invalidations": 0, "size": 2}
+
+
+def test_ttl_expiry():
+    clock = Clock()
+    cache = BasketCache(ttl=10, clock=clock)
+    cache.put({1}, "recommend_lift", 5, [2], version=0)
+    clock.time = 9
+    assert cache.get({1}, "recommend_lift", 5, version=0) == [2]
+    clock.time = 10
+    assert cache.get({1}, "recommend_lift", 5, version=0) is None
+    assert cache.expirations == 1
+    assert len(cache) == 0
+
+
+def test_another_version_invalidates_the_cache():
+    cache = BasketCache()
+    cache.put({1}, "recommend_lift", 5, [2], version=0)
+    cache.put({2}, "recommend_lift", 5, [1], version=0)
+    assert cache.get({1}, "recommend_lift", 5, version=1) is None
+    assert len(cache) == 0
+    assert cache.invalidations == 1
+
+
+def test_recommend_follows_incremental_updates(transactions, score):
+    rules = IncrementalRules(IncrementalMiner(transactions[:100], 0.05), 0.3)
+    cache = BasketCache()
+    basket = set(transactions[0])
+
+    def recommend():
+        return cache.recommend(Recommendations.recommend_lift, basket, rules.rules, rules.cache, rules.support_dict,
+                               3, version=rules.version)
+
+    first = recommend()
+    assert recommend() == first
+    assert cache.hits == 1
+    rules.update(transactions[100:])
+    # The rules are patched in place, the new version makes the cache recommend again
+    recommended = recommend()
+    assert cache.invalidations == 1
+    expected, support_dict = association_rules(list(rules.support_dict), list(rules.support_dict.values()), 0.3)
+    statistics = score(basket, expected, support_dict)
+    ranking = sorted((statistic["lift"] for statistic in statistics.values()), reverse=True)
+    assert [statistics[item]["lift"] for item in recommended] == pytest.approx(ranking[:3])
+
+
+def test_recommend_requires_the_version():
+    with pytest.raises(TypeError):
+        BasketCache().recommend(Recommendations.recommend_lift, {1}, [], dict(), dict(), 3)
@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from Apriori import association_rules
+from RuleStore import RuleStore
+from utils import rules_cache
+
+
+@pytest.fixture(scope="module")
+def frequent(transactions, mine):
+    return mine(transactions, 0.03)
+
+
+@pytest.fixture(scope="module")
+def store(frequent):
+    return RuleStore.from_itemsets(list(frequent), list(frequent.values()), 0.1)
+
+
+def as_dict(rules):
+    return {(frozenset(antecedent), frozenset(consequent)): confidence
+            for antecedent, consequent, _, confidence in rules}
+
+
+@pytest.mark.parametrize("min_confidence", [0.1, 0.3, 0.6, 1.0])
+def test_threshold_views_match_association_rules(frequent, store, min_confidence):
+    rules, _ = association_rules(list(frequent), list(frequent.values()), min_confidence)
+    view = store.threshold(min_confidence)
+    assert len(view) == len(rules)
+    assert as_dict(view) == pytest.approx(as_dict(rules))
+    assert all(confidence >= min_confidence for _, _, _, confidence in view)
+    # The cache of a view only refers to its own rules
+    cache = view.rules_cache()
+    assert {item: set(indices) for item, indices in cache.items()} == rules_cache(list(view))
+
+
+def test_save_load_round_trip(store, tmp_path):
+    store.save(tmp_path)
+    loaded = RuleStore.load(tmp_path)
+    assert isinstance(loaded.confidences, np.memmap)
+    assert list(loaded) == list(store)
+    assert list(loaded.threshold(0.5)) == list(store.threshold(0.5))
+    assert loaded.rules_cache() == store.rules_cache()
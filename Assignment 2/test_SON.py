@@ -0,0 +1,42 @@
+import tempfile
+
+import pytest
+
+from Apriori import apriori
+from SON import son
+from TransactionDatabase import TransactionDatabase
+
+
+@pytest.mark.parametrize("min_support", [0.01, 0.03, 0.2])
+@pytest.mark.parametrize("n_partitions", [1, 3, 7])
+def test_son_matches_apriori(transactions, mine, min_support, n_partitions):
+    expected = mine(transactions, min_support)
+    frequent_itemsets, itemsets_by_length = son(transactions, min_support, n_partitions=n_partitions, max_workers=2)
+    assert frequent_itemsets.keys() == expected.keys()
+    assert frequent_itemsets == apriori(transactions, min_support)[0]
+    assert sum(map(len, itemsets_by_length)) == len(expected)
+
+
+def test_son_inputs(transactions, mine, tmp_path):
+    expected = mine(transactions, 0.05).keys()
+    filename = tmp_path / "transactions.dat"
+    filename.write_text("".join(" ".join(map(str, transaction)) + "\n" for transaction in transactions))
+    assert son(TransactionDatabase.from_transactions(transactions), 0.05, max_workers=2)[0].keys() == expected
+    assert son(filename, 0.05, max_workers=2)[0].keys() == expected
+    assert son(str(filename), 0.05, n_partitions=4, max_workers=2)[0].keys() == expected
+    assert son([], 0.05) == (dict(), [dict()])
+
+
+def test_son_removes_the_saved_database(transactions, mine, tmp_path, monkeypatch):
+    # A database in memory is saved for the workers, in a temporary directory that has to be removed afterwards
+    directories = []
+    make_directory = tempfile.mkdtemp
+
+    def mkdtemp(prefix=None, dir=None):
+        directories.append(make_directory(prefix=prefix, dir=tmp_path))
+        return directories[-1]
+
+    monkeypatch.setattr(tempfile, "mkdtemp", mkdtemp)
+    assert son(transactions, 0.05, n_partitions=3, max_workers=2)[0].keys() == mine(transactions, 0.05).keys()
+    assert len(directories) == 1
+    assert not any(tmp_path.iterdir())
@@ -0,0 +1,144 @@
+import asyncio
+import json
+
+import numpy as np
+import pytest
+
+from BatchRecommendations import BatchRecommender
+from ItemDictionary import ItemDictionary
+from RuleStore import RuleStore
+from Server import Model, RecommendationServer
+
+
+@pytest.fixture(scope="module")
+def dictionary(transactions):
+    return ItemDictionary.from_transactions(transactions)
+
+
+@pytest.fixture(scope="module")
+def rule_sets(transactions, dictionary, mine, tmp_path_factory):
+    # Two rule sets of item codes, saved with the item id of every code and the 10 most popular codes
+    encoded = dictionary.encode_transactions(transactions)
+    directories = []
+    for min_support in (0.03, 0.1):
+        frequent = mine(encoded, min_support)
+        directory = tmp_path_factory.mktemp("rules")
+        store = RuleStore.from_itemsets(list(frequent), list(frequent.values()), 0.2)
+        store.items = np.array(dictionary.items)
+        store.popular_items = np.arange(10)
+        store.save(directory)
+        directories.append(directory)
+    return directories
+
+
+async def request(port, method, path, data=None):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    body = json.dumps(data).encode() if data is not None else b""
+    writer.write(f"{method} {path} HTTP/1.1\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode()
+                 + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    while (await reader.readline()) not in (b"\r\n", b""):
+        pass
+    response = json.loads(await reader.read())
+    writer.close()
+    return status, response
+
+
+def serve(model, client):
+    async def run():
+        server = RecommendationServer(model)
+        await server.start(port=0)
+        try:
+            return await client(server, server.server.sockets[0].getsockname()[1])
+        finally:
+            await server.stop()
+    return asyncio.run(run())
+
+
+def test_concurrent_requests_match_batch_recommender(transactions, dictionary, rule_sets):
+    model = Model.load(rule_sets[0])
+    baskets = [sorted(transaction) for transaction in transactions[:40]]
+    strategies = ["recommend_lift", "recommend_average_confidence", "recommend_total_support"]
+
+    async def client(server, port):
+        return await asyncio.gather(*(request(port, "POST", "/recommend",
+                                              {"basket": basket, "strategy": strategy, "top_n": 3})
+                                      for basket in baskets for strategy in strategies))
+
+    responses = serve(model, client)
+    expected = BatchRecommender(RuleStore.load(rule_sets[0])).recommend_all(
+        [set(dictionary.encode(basket)) for basket in baskets], strategies, [3])
+    responses = iter(responses)
+    for index, basket in enumerate(baskets):
+        for strategy in strategies:
+            status, response = next(responses)
+            assert status == 200
+            items = [dictionary.items[code] for code in expected[strategy, 3][index]]
+            assert response == {"items": items, "version": 0}
+
+
+def test_reload_swaps_the_rule_set(rule_sets):
+    async def client(server, port):
+        before = await request(port, "GET", "/health")
+        reloaded = await request(port, "POST", "/reload", {"directory": str(rule_sets[1])})
+        after = await request(port, "POST", "/recommend", {"basket": [0], "top_n": 2})
+        return before, reloaded, after
+
+    before, reloaded, after = serve(Model.load(rule_sets[0]), client)
+    assert before[0] == 200
+    assert (before[1]["version"], before[1]["rules"]) == (0, len(RuleStore.load(rule_sets[0])))
+    assert reloaded == (200, {"version": 1, "rules": len(RuleStore.load(rule_sets[1]))})
+    assert after[0] == 200 and after[1]["version"] == 1
+
+
+def test_invalid_requests(rule_sets):
+    async def client(server, port):
+        return [await request(port, "GET", "/unknown"),
+                await request(port, "GET", "/recommend"),
+                await request(port, "POST", "/recommend", {"strategy": "recommend_lift"}),
+                await request(port, "POST", "/recommend", {"basket": [1], "strategy": "recommend_nothing"}),
+                await request(port, "POST", "/recommend", {"basket": ["one"]}),
+                await request(port, "POST", "/recommend", {"basket": [1], "top_n": 0}),
+                await request(port, "POST", "/recommend", {"basket": [1], "top_n": "3"}),
+                await request(port, "POST", "/recommend", {"basket": [1], "top_n": True}),
+                # Valid JSON, but not an object
+                await request(port, "POST", "/recommend", [1, 2]),
+                await request(port, "POST", "/reload", [1, 2])]
+
+    assert [status for status, _ in serve(Model.load(rule_sets[0]), client)] == [404, 405] + [400] * 8
+
+
+def test_malformed_request_line(rule_sets):
+    async def client(server, port):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b"GARBAGE\r\n\r\n")
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+        return response
+
+    assert serve(Model.load(rule_sets[0]), client).startswith(b"HTTP/1.1 400 ")
+
+
+def test_model_needs_the_items_of_its_codes(dictionary, rule_sets, tmp_path):
+    RuleStore.load(rule_sets[0]).threshold(0.5).save(tmp_path)
+    with pytest.raises(ValueError):
+        Model.load(tmp_path)
+    # The popular items of the rule set are decoded to item ids
+    model = Model.load(rule_sets[0])
+    assert model.recommend([([], "recommend_popularity", 3)]) == [dictionary.items[:3]]
+
+
+def test_repeated_baskets_are_answered_from_the_cache(rule_sets):
+    async def client(server, port):
+        responses = [await request(port, "POST", "/recommend", {"basket": [0, 1], "top_n": 2}),
+                     await request(port, "POST", "/recommend", {"basket": [1, 0], "top_n": 2})]
+        await request(port, "POST", "/reload", {"directory": str(rule_sets[1])})
+        responses.append(await request(port, "POST", "/recommend", {"basket": [0, 1], "top_n": 2}))
+        return responses, (await request(port, "GET", "/health"))[1]["cache"]
+
+    (first, second, reloaded), stats = serve(Model.load(rule_sets[0]), client)
+    assert first == second
+    assert reloaded[1]["version"] == 1
+    assert (stats["hits"], stats["misses"], stats["invalidations"]) == (1, 2, 1)
@@ -0,0 +1,68 @@
+import os
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from Apriori import apriori
+from FPGrowth import fp_growth
+from ItemDictionary import ItemDictionary
+from NDI import non_derivable_itemsets
+from TransactionDatabase import TransactionDatabase, count_items
+from utils import get_popular_items
+
+
+@pytest.fixture(scope="module")
+def database(transactions):
+    return TransactionDatabase.from_transactions(transactions)
+
+
+def test_indexing_and_iteration(transactions, database):
+    assert len(database) == len(transactions)
+    assert list(database) == transactions
+    assert database[3] == transactions[3]
+    assert database[-1] == transactions[-1]
+    assert list(database[10:20]) == transactions[10:20]
+    assert list(database.take([5, 2, 5])) == [transactions[5], transactions[2], transactions[5]]
+    with pytest.raises(IndexError):
+        database[len(transactions)]
+
+
+def test_open_converts_changed_files(transactions, tmp_path):
+    filename = tmp_path / "transactions.dat"
+    filename.write_text("".join(" ".join(map(str, transaction)) + "\n" for transaction in transactions))
+    database = TransactionDatabase.open(filename)
+    assert isinstance(database.indices, np.memmap)
+    assert list(database) == transactions
+
+    filename.write_text("1 2 2\n\n3\n")
+    stat = (tmp_path / "transactions.db" / "indices.npy").stat()
+    os.utime(filename, (stat.st_mtime + 1, stat.st_mtime + 1))
+    assert list(TransactionDatabase.open(filename)) == [{1, 2}, set(), {3}]
+
+
+def test_counts_and_popular_items(transactions, database, tmp_path):
+    counts = Counter(item for transaction in transactions for item in transaction)
+    assert count_items(database) == counts
+    assert list(count_items(database)) == list(counts)
+    expected = [item for item, _ in counts.most_common(5)]
+    assert database.popular_items(5) == expected
+    filename = tmp_path / "transactions.dat"
+    filename.write_text("".join(" ".join(map(str, transaction)) + "\n" for transaction in transactions))
+    assert get_popular_items(5, filename) == expected
+
+
+def test_split_and_encode(transactions, database):
+    train, test = database.split(test_size=0.2, random_state=0)
+    assert len(test) == round(0.2 * len(transactions))
+    assert sorted(map(sorted, list(train) + list(test))) == sorted(map(sorted, transactions))
+
+    dictionary = ItemDictionary.from_counts(count_items(train))
+    assert list(test.encode(dictionary)) == [set(codes) for codes in dictionary.encode_transactions(test)]
+
+
+def test_miners_accept_a_database(transactions, database, mine):
+    expected = mine(transactions, 0.03).keys()
+    assert apriori(database, 0.03)[0].keys() == expected
+    assert fp_growth(database, 0.03)[0].keys() == expected
+    assert set(non_derivable_itemsets(database, 10)[0]) == set(non_derivable_itemsets(transactions, 10)[0])
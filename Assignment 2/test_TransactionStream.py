@@ -0,0 +1,50 @@
+from collections import Counter
+
+import pytest
+
+from Apriori import apriori, count_support, transaction_bitmaps
+from FPGrowth import fp_growth
+from NDI import non_derivable_itemsets
+from TransactionDatabase import TransactionDatabase, count_items
+from TransactionStream import TransactionStream
+
+
+@pytest.fixture(scope="module")
+def stream(transactions, tmp_path_factory):
+    filename = tmp_path_factory.mktemp("stream") / "transactions.dat"
+    filename.write_text("".join(" ".join(map(str, transaction)) + "\n" for transaction in transactions))
+    # A chunk size that doesn't divide the number of transactions, so the last chunk is smaller
+    return TransactionStream(filename, chunk_size=70)
+
+
+def test_stream_reads_chunks(transactions, stream):
+    chunks = list(stream.chunks())
+    assert [len(chunk) for chunk in chunks] == [70, 70, 70, 70, 20]
+    assert list(stream) == transactions
+    assert len(stream) == len(transactions)
+
+
+def test_count_items_by_chunk(transactions, stream, monkeypatch):
+    # Counting the items mustn't iterate over all transactions of the stream at once
+    monkeypatch.setattr(TransactionStream, "__iter__", lambda self: pytest.fail("iterated over the stream"))
+    counts = count_items(stream)
+    assert counts == Counter(item for transaction in transactions for item in transaction)
+
+
+def test_count_support_matches_scan(transactions, stream):
+    itemsets = [(0,), (1, 2), (0, 3, 5), (999,), (1, 999)]
+    expected = [sum(set(itemset) <= transaction for transaction in transactions) for itemset in itemsets]
+    database = TransactionDatabase.from_transactions(transactions)
+    assert count_support(transactions, itemsets).tolist() == expected
+    assert count_support(database, itemsets, transaction_bitmaps(database)).tolist() == expected
+    assert count_support(stream, itemsets).tolist() == expected
+    assert count_support(stream, []).tolist() == []
+
+
+def test_miners_accept_a_stream(transactions, stream, mine):
+    expected = mine(transactions, 0.03)
+    frequent_itemsets, _ = apriori(stream, 0.03)
+    assert frequent_itemsets.keys() == expected.keys()
+    assert all(frequent_itemsets[itemset] == pytest.approx(support) for itemset, support in expected.items())
+    assert fp_growth(stream, 0.03)[0].keys() == expected.keys()
+    assert set(non_derivable_itemsets(stream, 10)[0]) == set(non_derivable_itemsets(transactions, 10)[0])
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from NDI import non_derivable_itemsets
+from utils import evaluate_cutoffs, evaluate_recommendation_lists, sort_by_support, support_threshold
+
+TEST_DATA = [({1}, [2, 3]), ({4}, [5]), ({6}, []), ({7}, [8, 9, 10])]
+RECOMMENDATIONS = [[3, 11, 2, 12], [13, 14, 15, 16], [17, 18, 19, 20], [9, 21, 22, 8]]
+
+
+@pytest.mark.parametrize("min_support", [2, 3, 10, 30, 301])
+def test_support_threshold_matches_mining_again(transactions, mine, min_support):
+    itemsets, supports = sort_by_support(*non_derivable_itemsets(transactions, 2))
+    assert all(supports[:-1] >= supports[1:])
+    frequent_itemsets, support_itemsets = support_threshold(itemsets, supports, min_support)
+    assert dict(zip(frequent_itemsets, support_itemsets.tolist())) == \
+        dict(zip(*non_derivable_itemsets(transactions, min_support)))
+
+    counts = mine(transactions, 2 / len(transactions))
+    itemsets, supports = sort_by_support(list(counts), [round(count * len(transactions)) for count in counts.values()])
+    frequent_itemsets, _ = support_threshold(itemsets, supports, min_support)
+    assert set(frequent_itemsets) == mine(transactions, min_support / len(transactions)).keys()
+
+
+def test_cutoffs_match_evaluate_recommendation_lists():
+    results = evaluate_cutoffs(TEST_DATA, RECOMMENDATIONS, (1, 2, 4))
+    for top_n, row in zip((1, 2, 4), results):
+        recommendations = [items[:top_n] for items in RECOMMENDATIONS]
+        assert row[:3] == pytest.approx(evaluate_recommendation_lists(TEST_DATA, recommendations, top_n))
+
+
+def test_map_and_ndcg():
+    results = evaluate_cutoffs(TEST_DATA, RECOMMENDATIONS, (2, 4))
+    # Average precision @4: the first entry hits 2 of its 2 items at ranks 1 and 3, the last one 2 of its 3 items
+    # at ranks 1 and 4
+    assert results[1, 3] == pytest.approx(((1 + 2 / 3) / 2 + 0 + 0 + (1 + 2 / 4) / 3) / 4)
+    assert results[0, 3] == pytest.approx((1 / 2 + 0 + 0 + 1 / 2) / 4)
+    # The ideal ranking of the last entry has its 3 true items first
+    discounts = 1 / np.log2(np.arange(2, 6))
+    first = (discounts[0] + discounts[2]) / (discounts[0] + discounts[1])
+    last = (discounts[0] + discounts[3]) / discounts[:3].sum()
+    assert results[1, 4] == pytest.approx((first + last) / 4)
+
+
+def test_without_test_data():
+    assert evaluate_cutoffs([], [], (3, 5)).tolist() == [[0] * 5] * 2
@@ -1,8 +1,23 @@
 import random
+from pathlib import Path
 
 import matplotlib.pyplot as plt
 import numpy as np
 
+from Instrumentation import instrumentation
+from TransactionDatabase import TransactionDatabase
+
+
+def iter_transactions(filename):
+    """
+    Iterate over the transactions in a file without reading the whole file
+    :param filename: The filename to read from
+    :return: A generator of sets, where each set is a transaction
+    """
+    with open(filename) as f:
+        for line in f:
+            yield set(map(int, line.rstrip().split()))
+
 
 def read_transactions(filename):
     """
@@ -10,9 +25,7 @@ def read_transactions(filename):
     :param filename: The filename to read from
     :return: A list of sets, where each set is a transaction
     """
-    with open(filename) as f:
-        transactions = [set(map(int, line.rstrip().split())) for line in f]
-    return transactions
+    return list(iter_transactions(filename))
 
 
 def write_transactions(filename, transactions):
@@ -43,34 +56,59 @@ def split_transactions(transactions, min_items=10, ground_truth_items=5):
     return result
 
 
-def read_frequent_itemsets(filename, ndi=False):
+def read_frequent_itemsets(filename, ndi=False, dictionary=None):
     """
     Read frequent itemsets from a file
     :param filename: The filename to read from
     :param ndi: If False, the output of apriori is expected. If True, the output of ndi is expected.
+    :param dictionary: If given, the itemsets are encoded with this ItemDictionary
     :return: Frequent itemsets and their supports
     """
     index = -2 if ndi else -1
-    with open(filename) as f:
+    with instrumentation.stage("read_frequent_itemsets"), open(filename) as f:
         lines = [line.rstrip().split() for line in f]
-
-    itemsets = [set(map(int, line[:index])) for line in lines]
-    supports = [int(line[index][1: -1]) for line in lines]
+        itemsets = [set(map(int, line[:index])) for line in lines]
+        supports = [int(line[index][1: -1]) for line in lines]
+    if dictionary is not None:
+        return [dictionary.encode(itemset) for itemset in itemsets], supports
     # Convert to frozenset
     itemsets = [frozenset(itemset) for itemset in itemsets]
     frequent_itemsets = itemsets
     return frequent_itemsets, supports
 
 
-def get_popular_items(top_n=10):
-    # Get the top n most popular items
-    item_counts = {}
-    with open("data/retail.dat") as f:
-        for line in f:
-            for item in line.rstrip().split():
-                item_counts[int(item)] = item_counts.get(int(item), 0) + 1
-    popular_items = sorted(item_counts, key=item_counts.get, reverse=True)[:top_n]
-    return popular_items
+def sort_by_support(frequent_itemsets, supports):
+    """
+    Sort frequent itemsets on descending support
+    The frequent itemsets of any higher minimum support are then a prefix of the sorted itemsets,
+    so they only have to be mined once at the lowest minimum support.
+    :param frequent_itemsets: Frequent itemsets
+    :param supports: Supports of the frequent itemsets
+    :return: Frequent itemsets and their supports as arrays, sorted on descending support
+    """
+    supports = np.asarray(supports)
+    order = np.argsort(-supports, kind="stable")
+    itemsets = np.empty(len(frequent_itemsets), dtype=object)
+    for position, index in enumerate(order):
+        itemsets[position] = frequent_itemsets[index]
+    return itemsets, supports[order]
+
+
+def support_threshold(frequent_itemsets, supports, min_support):
+    """
+    Select the frequent itemsets for a higher minimum support without mining them again
+    :param frequent_itemsets: Frequent itemsets as returned by sort_by_support
+    :param supports: Supports as returned by sort_by_support
+    :param min_support: Minimum support, at least the minimum support the itemsets were mined with
+    :return: Views on the frequent itemsets and supports with support >= min_support
+    """
+    end = np.searchsorted(-supports, -min_support, side="right")
+    return frequent_itemsets[:end], supports[:end]
+
+
+def get_popular_items(top_n=10, filename="data/retail.dat"):
+    # Get the top n most popular items, counted on the memory-mapped database of the file
+    return TransactionDatabase.open(filename).popular_items(top_n)
 
 
 def evaluate_recommendations(test_data, recommender_lambda, top_n=5):
@@ -81,13 +119,25 @@ def evaluate_recommendations(test_data, recommender_lambda, top_n=5):
     :param top_n: Top n to calculate precision, recall, and F1 score @top_n
     :return: Precision, recall, and F1 score
     """
+    # Get recommendations for the users
+    recommendations = [recommender_lambda(input_items) for input_items, _ in test_data]
+    return evaluate_recommendation_lists(test_data, recommendations, top_n)
+
+
+def evaluate_recommendation_lists(test_data, recommendations, top_n=5):
+    """
+    Evaluate recommendations that were already made for all test data, e.g. by a batch recommender
+    :param test_data: Test data
+    :param recommendations: The recommended items for every entry of the test data
+    :param top_n: Top n to calculate precision, recall, and F1 score @top_n
+    :return: Precision, recall, and F1 score
+    """
     true_positives = 0
     # false_positives = 0
     false_negatives = 0
 
-    for input_items, true_items in test_data:
-        # Get recommendations for the user
-        recommended_items = set(recommender_lambda(input_items))
+    for (_, true_items), recommended_items in zip(test_data, recommendations):
+        recommended_items = set(recommended_items)
         true_items = set(true_items)
         true_positives += len(recommended_items.intersection(true_items))
         # false_positives += len(recommended_items - true_items)
@@ -99,24 +149,73 @@ def evaluate_recommendations(test_data, recommender_lambda, top_n=5):
     return precision, recall, f1_score
 
 
+def evaluate_cutoffs(test_data, recommendations, top_ns=(3, 5, 10)):
+    """
+    Evaluate recommendations at several cutoffs at once
+    The recommendations are ranked, so the top n for a smaller n is a prefix of the recommendations for the largest n.
+    :param test_data: Test data
+    :param recommendations: The recommended items for every entry of the test data, at least max(top_ns) items
+    :param top_ns: Cutoffs to calculate the metrics @top_n for
+    :return: Array with a row per cutoff of precision, recall, F1 score, MAP and NDCG
+    """
+    top_ns = np.asarray(top_ns)
+    max_n = int(top_ns.max())
+    # hits[i, j] is 1 if the item at rank j of test entry i is a true item
+    hits = np.zeros((len(test_data), max_n))
+    n_true = np.zeros(len(test_data))
+    for i, ((_, true_items), recommended_items) in enumerate(zip(test_data, recommendations)):
+        true_items = set(true_items)
+        n_true[i] = len(true_items)
+        for j, item in enumerate(recommended_items[:max_n]):
+            if item in true_items:
+                hits[i, j] = 1
+    if len(test_data) == 0:
+        return np.zeros((len(top_ns), 5))
+
+    # True positives at every rank, the true positives @n are the column n - 1
+    cumulative_hits = np.cumsum(hits, axis=1)
+    true_positives = cumulative_hits[:, top_ns - 1].sum(axis=0)
+    precision = true_positives / (len(test_data) * top_ns)
+    # Every true item that isn't recommended is a false negative, so true positives + false negatives is n_true
+    recall = true_positives / n_true.sum() if n_true.sum() > 0 else np.zeros(len(top_ns))
+    f1_score = np.divide(2 * precision * recall, precision + recall, out=np.zeros(len(top_ns)),
+                         where=precision + recall > 0)
+
+    ranks = np.arange(1, max_n + 1)
+    # Average precision: the precision at the rank of every hit, divided by the number of hits that were possible
+    precision_at_hits = np.cumsum(hits * cumulative_hits / ranks, axis=1)[:, top_ns - 1]
+    possible = np.minimum(n_true[:, None], top_ns[None, :])
+    average_precision = np.divide(precision_at_hits, possible, out=np.zeros_like(precision_at_hits),
+                                  where=possible > 0)
+    # Normalized discounted cumulative gain, the ideal ranking has all true items first
+    discounts = 1 / np.log2(ranks + 1)
+    dcg = np.cumsum(hits * discounts, axis=1)[:, top_ns - 1]
+    ideal = np.concatenate(([0], np.cumsum(discounts)))[possible.astype(int)]
+    ndcg = np.divide(dcg, ideal, out=np.zeros_like(dcg), where=ideal > 0)
+    return np.column_stack([precision, recall, f1_score, average_precision.mean(axis=0), ndcg.mean(axis=0)])
+
+
 def rules_cache(rules):
     # Probs to Noah Dani�ls for the idea
     # This cache is used in the recommendations
     # Using this cache we can quickly find the relevant rules for the input items
     # The recommendations will only loop over the relevant rules instead of all rules
     cache = dict()
-    for index, (antecedent, _, _, _) in enumerate(rules):
-        for item in antecedent:
-            if item not in cache:
-                cache[item] = set()
-            cache[item].add(index)
+    with instrumentation.stage("rules_cache"):
+        for index, (antecedent, _, _, _) in enumerate(rules):
+            for item in antecedent:
+                if item not in cache:
+                    cache[item] = set()
+                cache[item].add(index)
     return cache
 
 
 def plot(metric, key, x_labels, y_labels, data, save=True):
     """
     Plot the results of the metrics
+    Every plot gets its own figure, which is closed afterwards so the plots don't pile up in one figure.
     """
+    figure = plt.figure()
     plt.imshow(data, cmap=plt.cm.Greens)
 
     y_range, x_range = data.shape
@@ -131,7 +230,9 @@ def plot(metric, key, x_labels, y_labels, data, save=True):
         plt.text(y, x, t, ha="center", va="center", bbox=dict(boxstyle='round', facecolor='white', edgecolor='0.3'))
 
     if save:
+        Path(f"results/plots/{metric}").mkdir(parents=True, exist_ok=True)
         plt.savefig(f"results/plots/{metric}/{metric}@{key[0]}_{key[2]}_ndi_{key[1]}.png")
     else:
         plt.show()
+    plt.close(figure)
 